@@ -17,6 +17,11 @@ case "$1" in
     exec python -u src/Execute.py "$@"
     ;;
 
+  "performance-agent")
+    log "Uruchamianie agenta generującego obciążenie..."
+    exec python -u src/Agent.py "${@:2}"
+    ;;
+
   "lstm-trainer")
     log "Uruchamianie trenowania modelu LSTM..."
     # Upewnij się, że katalog na modele LSTM istnieje
@@ -35,7 +40,7 @@ case "$1" in
       log "Wykonywanie komendy: $*"
       exec "$@"
     else
-      log "Nie określono typu serwisu. Dostępne opcje: performance-test, lstm-trainer, visualizer"
+      log "Nie określono typu serwisu. Dostępne opcje: performance-test, performance-agent, lstm-trainer, visualizer"
       exit 1
     fi
     ;;
@@ -0,0 +1,11 @@
+import argparse
+
+from src.utils.Distributed import Agent
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description='Run a load generator agent controlled by Execute.py --agents.')
+parser.add_argument('--host', default='0.0.0.0', help='Interface to listen on.')
+parser.add_argument('--port', type=int, default=9100, help='Port to listen on for the coordinator.')
+args = parser.parse_args()
+
+Agent(args.host, args.port).serve_forever()
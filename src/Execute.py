@@ -1,44 +1,132 @@
 import argparse
 import csv
+import os
+import sys
 
+from src.utils.Distributed import Coordinator
+from src.utils.LoadProfile import load_profile
+from src.utils.Paths import open_result_file
 from src.utils.Scenario import Scenario
+from src.utils.Replay import MAX_LABELS
 from src.utils.Request import Request
+from src.utils.ResultStore import ResultStore, get_store_dir
+from src.utils.ResultWriter import CSV_HEADER
+from src.utils.RunCatalog import RunCatalog
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description='Execute scenarios.')
 parser.add_argument('--max_timeout', type=int, default=1, help='Maximum timeout for server response in seconds.')
+parser.add_argument('--engine', choices=Scenario.engines, default='threads',
+                    help='Load engine: one thread per virtual user or coroutines on a single event loop.')
+parser.add_argument('--connection', choices=Scenario.connections, default='new',
+                    help='Open a new connection per request (browser-like) or reuse one per virtual user.')
+parser.add_argument('--pool_size', type=int, default=1,
+                    help='Connections kept open per virtual user when reusing (threads engine only).')
+parser.add_argument('--keep_alive', type=float, default=None,
+                    help='Idle seconds after which a reused connection is dropped.')
+parser.add_argument('--no_csv', action='store_true',
+                    help='Write only the columnar results store, without the results.csv export.')
+parser.add_argument('--raw_rows', type=int, default=1,
+                    help='Keep every raw result row (1), one in N rows (N) or none (0); stage statistics use all rows.')
+parser.add_argument('--profile', default=os.path.join(os.path.dirname(__file__), 'profiles', 'default.json'),
+                    help='Load profile (JSON/YAML) with the stages to run.')
+parser.add_argument('--agents', nargs='*', default=[],
+                    help='Agents (host:port) that generate the load; without them the load is generated locally.')
+parser.add_argument('--processes', type=int, default=1,
+                    help='Worker processes the virtual users are sharded across (0 = one per CPU core).')
+parser.add_argument('--flow', action='store_true',
+                    help='Every virtual user runs the whole request chain in order, sharing its extracted values.')
+parser.add_argument('--response', choices=Request.response_policies, default='print',
+                    help='What to do with response bodies: print, discard, keep size/checksum, or print a sample.')
+parser.add_argument('--sample_every', type=int, default=100,
+                    help='Print one response body in N with --response sample.')
+parser.add_argument('--search_sla', type=float, default=None,
+                    help='Instead of the profile, search for the highest vuser count whose latency stays within '
+                         'this many ms.')
+parser.add_argument('--search_percentile', type=float, default=95, help='Latency percentile checked by --search_sla.')
+parser.add_argument('--search_max_users', type=int, default=1000, help='Upper bound of the capacity search.')
+parser.add_argument('--pacing', type=float, default=None,
+                    help='Intended seconds between iteration starts of a virtual user; latencies of late '
+                         'iterations are also recorded from their intended start.')
+parser.add_argument('--think_time', default=None,
+                    help='Pause after each request instead of a fixed interval: seconds, or uniform:MIN:MAX, '
+                         'exponential:MEAN, lognormal:MEAN:SIGMA.')
+parser.add_argument('--start_offset', type=float, default=0,
+                    help='Every virtual user starts after a random delay of up to this many seconds.')
+parser.add_argument('--on_error', choices=Scenario.error_policies, default='continue',
+                    help='What a virtual user does after a failed request; failures are recorded either way.')
+parser.add_argument('--replay', default=None,
+                    help='Instead of the profile, replay a recorded JSONL or HAR request log with its original timing.')
+parser.add_argument('--replay_speed', type=float, default=1.0,
+                    help='Replay speed factor: 2 sends the recorded traffic twice as fast.')
+parser.add_argument('--replay_max_labels', type=int, default=MAX_LABELS,
+                    help='Distinct endpoints replayed results are grouped by; further ones are recorded as "other".')
+parser.add_argument('--feeder', nargs='+', action='append', default=[],
+                    help='Data file (CSV with a header or JSONL) feeding template variables: PATH [MODE [NAME]], '
+                         'MODE sequential, random or unique. Can be repeated.')
+parser.add_argument('--metrics_port', type=int, default=None,
+                    help='Serve live Prometheus metrics of the run on this port (/metrics).')
+parser.add_argument('--run_label', default=None, help='Label of this run in the run catalog (results/runs).')
+parser.add_argument('--no_catalog', action='store_true', help='Do not keep a copy of this run in the run catalog.')
 args = parser.parse_args()
 
-# Initialize and prepare CSV file for results
-with open(Scenario.results_file, mode='w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerow(["VusersNumber", "URL", "StartTime", "EndTime", "ResponseTime[ms]"])
+# Initialize and prepare result files
+ResultStore(get_store_dir(Scenario.results_file)).reset()
+open_result_file(Scenario.get_stage_stats_file(), mode='w').close()
+Scenario.csv_export = not args.no_csv
+Scenario.raw_rows = args.raw_rows
+if Scenario.csv_export:
+    with open_result_file(Scenario.results_file, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+elif os.path.exists(Scenario.results_file):
+    os.remove(Scenario.results_file)  # A previous run's export would be read (and archived) as this run's
 
 # Define scenarios
 # request1 = (Request("First URL").set_url("https://www.wp.pl/").set_method("GET").set_headers(""))
 request1 = (Request("First URL").set_url("http://192.168.56.103:5000/api/basic").set_method("GET").set_headers(""))
 Scenario.requests.append(request1)
+for request in Scenario.requests:
+    request.set_response_policy(args.response, args.sample_every)
 
 
+if args.metrics_port:
+    Scenario.serve_metrics(args.metrics_port)
+
 # Set interval between requests
-scenario = Scenario()
-scenario.speed(1, 60)
-scenario.speed(20, 60)
-scenario.speed(30, 60)
-scenario.speed(40, 60)
-scenario.speed(50, 60)
-scenario.speed(60, 60)
-scenario.speed(70, 60)
-scenario.speed(80, 60)
-scenario.speed(90, 60)
-scenario.speed(100, 60)
-scenario.speed(110, 60)
-scenario.speed(120, 60)
-scenario.speed(130, 60)
-scenario.speed(140, 60)
-scenario.speed(150, 60)
-scenario.speed(160, 60)
-scenario.speed(170, 60)
-
-# Scenario.once() # Execute all scenarios sequentially, once each
+scenario = Scenario(engine=args.engine, connection=args.connection, pool_size=args.pool_size,
+                    keep_alive=args.keep_alive, processes=args.processes, flow=args.flow,
+                    pacing=args.pacing, on_error=args.on_error, think_time=args.think_time,
+                    start_offset=args.start_offset)
+for feeder in args.feeder:
+    scenario.add_feeder(*feeder[:3])
+
+# The next run starts by clearing the results, so every run is also kept in the catalog
+catalog = None if args.no_catalog else RunCatalog()
+run_id = None
+if catalog is not None:
+    run_id = catalog.start_run(label=args.run_label, profile=args.replay or args.profile,
+                               targets=[request.url for request in Scenario.requests],
+                               settings=scenario.settings(), argv=sys.argv[1:])
+    print(f"Run {run_id}")
+
+status = "failed"
+try:
+    if args.replay:
+        scenario.replay(args.replay, args.replay_speed, response_policy=args.response,
+                        max_labels=args.replay_max_labels)
+    elif args.search_sla is not None:
+        scenario.search(args.search_sla, args.search_percentile, max_users=args.search_max_users)
+    elif args.agents:
+        Coordinator(args.agents).run(scenario, load_profile(args.profile))
+    else:
+        scenario.profile(args.profile)
 
+    # Scenario.once() # Execute all scenarios sequentially, once each
+    status = "complete"
+finally:
+    print(f"Result writer: {Scenario.get_writer().stats()}")
+    if catalog is not None:
+        Scenario.close_writer()  # Every row and rollup on disk before the run is copied
+        catalog.finish_run(run_id, Scenario.results_file, Scenario.get_stage_stats_file(), status,
+                           copy_csv=Scenario.csv_export)
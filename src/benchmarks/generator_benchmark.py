@@ -0,0 +1,186 @@
+"""Self-benchmark of the load generator against a local stand-in HTTP server.
+
+The stand-in server answers every request after a known injected latency (fixed, or uniformly
+random around it) with a payload of a given size. Each generator configuration (engine,
+connection mode, worker processes) is driven at increasing vuser counts, and for each step the
+benchmark reports the throughput, the generator CPU time per request and the measurement error:
+the measured mean latency minus the mean latency the server actually injected. The highest
+throughput whose error stays within `--max_error_ms` is the configuration's sustainable RPS.
+
+    PYTHONPATH=. python src/benchmarks/generator_benchmark.py --latency_ms 5 --users 1 8 32 128
+"""
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from src.utils.Request import Request
+from src.utils.Scenario import Scenario
+
+CONFIGS = {
+    "threads-new": {"engine": "threads", "connection": "new"},
+    "threads-reuse": {"engine": "threads", "connection": "reuse"},
+    "async-new": {"engine": "async", "connection": "new"},
+    "async-reuse": {"engine": "async", "connection": "reuse"},
+    "processes-reuse": {"engine": "threads", "connection": "reuse", "processes": 0},
+}
+
+RESULT_HEADER = ["Config", "Vusers", "Requests", "Errors", "Throughput[rps]", "CpuPerRequest[ms]",
+                 "MeasuredMean[ms]", "InjectedMean[ms]", "MeasurementError[ms]", "P99[ms]"]
+
+
+class StandInServer:
+    """Minimal HTTP/1.1 server on asyncio, run in a child process so it does not share the GIL
+    or the CPU accounting with the generator. It counts the latency it injects."""
+
+    def __init__(self, latency_ms=5.0, jitter_ms=0.0, payload_bytes=1024):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.payload_bytes = payload_bytes
+        self.connection = None
+        self.process = None
+        self.port = None
+
+    def start(self):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=self._serve, args=(child,), daemon=True)
+        self.process.start()
+        self.port = self.connection.recv()
+        return self
+
+    def injected(self):
+        # (requests served, total injected latency in ms) since the previous call
+        self.connection.send("stats")
+        return self.connection.recv()
+
+    def stop(self):
+        self.connection.send("stop")
+        self.process.join()
+
+    def _serve(self, connection):
+        asyncio.run(self._main(connection))
+
+    async def _main(self, connection):
+        stats = [0, 0.0]
+        body = b"x" * self.payload_bytes
+        header = (f"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n"
+                  f"Content-Length: {self.payload_bytes}\r\n").encode()
+
+        async def handle(reader, writer):
+            try:
+                while True:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                    lines = head.decode("latin-1").lower().split("\r\n")
+                    length = next((int(line.split(":", 1)[1]) for line in lines
+                                   if line.startswith("content-length:")), 0)
+                    if length:
+                        await reader.readexactly(length)
+                    delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+                    started = time.perf_counter()
+                    await asyncio.sleep(delay / 1000)
+                    stats[0] += 1
+                    stats[1] += (time.perf_counter() - started) * 1000  # As slept, overshoot included
+                    close = "connection: close" in lines
+                    writer.write(header + (b"Connection: close\r\n\r\n" if close else b"\r\n") + body)
+                    await writer.drain()
+                    if close:
+                        break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+        connection.send(server.sockets[0].getsockname()[1])
+        loop = asyncio.get_running_loop()
+        async with server:
+            while True:
+                command = await loop.run_in_executor(None, connection.recv)
+                if command == "stop":
+                    return
+                connection.send(tuple(stats))
+                stats[0], stats[1] = 0, 0.0
+
+
+def run_step(config, users, duration, server):
+    scenario = Scenario(**CONFIGS[config])
+    server.injected()  # Reset the server's counters
+    before = os.times()
+    summary = scenario.speed(users, duration, stage=f"{config}-{users}").summary
+    after = os.times()
+    served, injected_ms = server.injected()
+
+    # Worker processes are joined by now, so their CPU time is in the children counters
+    cpu = sum(after[:4]) - sum(before[:4])
+    row = summary[-1] if summary else {"Count": 0, "Errors": 0, "Throughput[rps]": 0.0, "Mean[ms]": 0.0,
+                                       "P99[ms]": 0.0}
+    injected_mean = injected_ms / served if served else 0.0
+    return {
+        "Config": config,
+        "Vusers": users,
+        "Requests": row["Count"],
+        "Errors": row["Errors"],
+        "Throughput[rps]": row["Throughput[rps]"],
+        "CpuPerRequest[ms]": round(cpu * 1000 / row["Count"], 3) if row["Count"] else 0.0,
+        "MeasuredMean[ms]": row["Mean[ms]"],
+        "InjectedMean[ms]": round(injected_mean, 3),
+        "MeasurementError[ms]": round(row["Mean[ms]"] - injected_mean, 3),
+        "P99[ms]": row["P99[ms]"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the load generator against a local stand-in server.')
+    parser.add_argument('--latency_ms', type=float, default=5.0, help='Latency injected by the stand-in server.')
+    parser.add_argument('--jitter_ms', type=float, default=0.0,
+                        help='Random latency: uniformly latency_ms +/- jitter_ms instead of a fixed value.')
+    parser.add_argument('--payload_bytes', type=int, default=1024, help='Response body size.')
+    parser.add_argument('--configs', nargs='*', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--users', type=int, nargs='*', default=[1, 8, 32, 128], help='Vuser counts to step through.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per step.')
+    parser.add_argument('--max_error_ms', type=float, default=2.0,
+                        help='Largest measurement error at which a throughput still counts as sustainable.')
+    parser.add_argument('--output', default=None, help='CSV file for the per-step results.')
+    args = parser.parse_args()
+
+    # Benchmark rows go to a scratch directory, never over the results of a real run
+    Scenario.results_file = os.path.join(tempfile.mkdtemp(prefix="generator_benchmark_"), "results.csv")
+    server = StandInServer(args.latency_ms, args.jitter_ms, args.payload_bytes).start()
+    Scenario.requests = [Request("stand-in").set_url(f"http://127.0.0.1:{server.port}/").set_method("GET")
+                         .set_response_policy("discard")]
+    rows = []
+    try:
+        for config in args.configs:
+            for users in args.users:
+                row = run_step(config, users, args.duration, server)
+                rows.append(row)
+                print(", ".join(f"{key}={value}" for key, value in row.items()))
+    finally:
+        Scenario.close_writer()
+        server.stop()
+
+    print("\nSustainable throughput per configuration:")
+    for config in args.configs:
+        valid = [row for row in rows if row["Config"] == config and row["Requests"] and not row["Errors"]
+                 and abs(row["MeasurementError[ms]"]) <= args.max_error_ms]
+        if not valid:
+            print(f"  {config}: no step within {args.max_error_ms} ms measurement error")
+            continue
+        best = max(valid, key=lambda row: row["Throughput[rps]"])
+        print(f"  {config}: {best['Throughput[rps]']} rps at {best['Vusers']} vusers, "
+              f"{best['CpuPerRequest[ms]']} ms CPU per request, error {best['MeasurementError[ms]']} ms")
+
+    if args.output:
+        with open(args.output, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=RESULT_HEADER)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark of the LSTM training window construction against the number of result rows.
+
+For each row count the synthetic (vusers, response time) series is turned into training windows
+the way LstmResponsePredictor._prepare_data does now (a strided view over one copy of the scaled
+data) and, up to `--loop_max_rows`, the way it did before (a Python loop stacking every window).
+It reports the construction time and the peak memory allocated while building, measured with
+tracemalloc, and the peak while one epoch of training batches is copied out of the view.
+
+    PYTHONPATH=. python src/benchmarks/lstm_windows_benchmark.py --rows 10000 100000 1000000
+"""
+import argparse
+import csv
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.prediction_models.lstm.LstmResponsePredictor import LstmResponsePredictor, WindowBatches
+
+RESULT_HEADER = ["Rows", "Method", "Windows", "Time[s]", "PeakMemory[MB]", "BatchesPeakMemory[MB]",
+                 "MaterializedWindows[MB]"]
+
+
+def synthetic_results(rows, seed=0):
+    # Vusers ramping in steps, response time growing with them plus noise; shaped like results.csv columns
+    generator = np.random.default_rng(seed)
+    vusers = (np.arange(rows) // max(rows // 50, 1) + 1).astype(float).reshape(-1, 1)
+    responses = (20 + vusers * 1.5 + generator.normal(0, 5, size=(rows, 1))).clip(1)
+    return vusers, responses
+
+
+def loop_prepare_data(predictor, vusers_data, response_times):
+    # The former _prepare_data, kept as the reference the vectorized windows are compared with
+    vusers_scaled = predictor.scaler_vusers.fit_transform(vusers_data)
+    response_scaled = predictor.scaler_response.fit_transform(response_times)
+    X, y = [], []
+    for i in range(len(vusers_scaled) - predictor.sequence_length):
+        X.append(np.column_stack((vusers_scaled[i:i + predictor.sequence_length],
+                                  response_scaled[i:i + predictor.sequence_length]))
+                 .reshape(predictor.sequence_length, 2))
+        y.append(response_scaled[i + predictor.sequence_length])
+    return np.array(X), np.array(y)
+
+
+def measure(function, *args):
+    # (result, seconds, peak MB allocated during the call); the result is alive at the peak, so it counts
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def iterate_batches(X, y, batch_size):
+    batches = WindowBatches(X, y, batch_size)
+    for batch in range(len(batches)):
+        batches[batch]
+    return len(batches)
+
+
+def run_step(predictor, rows, method, batch_size):
+    vusers, responses = synthetic_results(rows)
+    prepare = predictor._prepare_data if method == "vectorized" else lambda *data: loop_prepare_data(predictor, *data)
+    (X, y), elapsed, peak = measure(prepare, vusers, responses)
+    batches_peak = measure(iterate_batches, X, y, batch_size)[2] if method == "vectorized" else ""
+    return {"Rows": rows, "Method": method, "Windows": len(X), "Time[s]": round(elapsed, 4),
+            "PeakMemory[MB]": round(peak, 2), "BatchesPeakMemory[MB]": batches_peak and round(batches_peak, 2),
+            "MaterializedWindows[MB]": round(len(X) * predictor.sequence_length * 2 * 8 / 2 ** 20, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LSTM training window construction.')
+    parser.add_argument('--rows', type=int, nargs='*', default=[10_000, 100_000, 1_000_000],
+                        help='Result row counts to step through.')
+    parser.add_argument('--sequence_length', type=int, default=5, help='Window length of the predictor.')
+    parser.add_argument('--batch_size', type=int, default=32, help='Training batch size for the batch pass.')
+    parser.add_argument('--loop_max_rows', type=int, default=200_000,
+                        help='Largest row count the former loop is run for; it takes minutes above that.')
+    parser.add_argument('--output', default=None, help='CSV file for the per-step results.')
+    args = parser.parse_args()
+
+    predictor = LstmResponsePredictor(sequence_length=args.sequence_length)
+    rows = []
+    for count in args.rows:
+        methods = ["vectorized"] + (["loop"] if count <= args.loop_max_rows else [])
+        for method in methods:
+            row = run_step(predictor, count, method, args.batch_size)
+            rows.append(row)
+            print(", ".join(f"{key}={value}" for key, value in row.items()))
+
+    if args.output:
+        with open(args.output, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=RESULT_HEADER)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
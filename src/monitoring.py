@@ -6,6 +6,7 @@ import pandas as pd
 import plotly.express as px
 import argparse
 from utils.Paths import get_results_csv_file
+from src.utils.ResultStore import load_results
 
 class Monitoring:
     def __init__(self, csv_file, use_interval=True, max_timeout=20):
@@ -19,7 +20,7 @@ class Monitoring:
 
     def load_data(self):
         try:
-            self.df = pd.read_csv(self.csv_file)
+            self.df = load_results(self.csv_file)
             self.process_data()
         except FileNotFoundError:
             print(f"Error: File {self.csv_file} not found.")
@@ -34,8 +35,6 @@ class Monitoring:
             exit(1)
 
     def process_data(self):
-        self.df['StartTime'] = pd.to_datetime(self.df['StartTime'], format='%H:%M:%S:%f')
-        self.df['EndTime'] = pd.to_datetime(self.df['EndTime'], format='%H:%M:%S:%f')
         self.df['ResponseTime[ms]'] = self.df['ResponseTime[ms]'].apply(lambda x: min(x, self.max_timeout * 1000))
 
     def setup_app(self):
@@ -1,12 +1,11 @@
-import concurrent.futures
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
-from functools import partial
 import os
-import multiprocessing
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from src.utils.ResultStore import load_results
 
 # Determine correct paths based on script location
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,10 +14,10 @@ visualization_path = os.path.join(current_dir, "results", "prediction_visualizat
 csv_output_path = os.path.join(current_dir, "results", "extended_predictions.csv")
 
 
-# Function to predict response time for a given virtual user count
-def predict_for_vuser(v, predictor):
-    vuser_sequence = np.array([v[0]] * predictor.sequence_length).reshape(-1, 1)
-    return predictor.predict_response_time(vuser_sequence)
+# Predicted response times for constant virtual user counts, all in one batched forward pass
+def predict_for_vusers(vusers, predictor):
+    vuser_sequences = np.repeat(np.asarray(vusers).reshape(-1, 1), predictor.sequence_length, axis=1)
+    return predictor.predict_batch(vuser_sequences)
 
 
 def main():
@@ -26,39 +25,8 @@ def main():
     print(f"Looking for results file at: {results_file}")
     print(f"Current directory: {os.getcwd()}")
 
-    # Load your existing results
-    results_df = pd.read_csv(results_file)
-
-    # Check if EndTime column exists, if not create a synthetic time series
-    if 'EndTime' not in results_df.columns:
-        # Create synthetic timestamps (one every minute)
-        start_time = datetime.now() - timedelta(minutes=len(results_df))
-        times = [start_time + timedelta(minutes=i) for i in range(len(results_df))]
-        results_df['EndTime'] = times
-    else:
-        # Convert the time format by replacing the last colon with a period
-        try:
-            results_df['EndTime'] = results_df['EndTime'].astype(str).str.replace(
-                r'(\d+):(\d+):(\d+):(\d+)', r'\1:\2:\3.\4', regex=True)
-
-            # Add today's date since these appear to be just times
-            base_date = datetime.now().strftime('%Y-%m-%d ')
-            results_df['EndTime'] = pd.to_datetime(
-                base_date + results_df['EndTime'],
-                format='%Y-%m-%d %H:%M:%S.%f',
-                errors='coerce'
-            )
-
-            # If any parsing failed, fill with synthetic times
-            if results_df['EndTime'].isna().any():
-                raise ValueError("Some timestamps could not be parsed")
-
-        except Exception as e:
-            print(f"Error parsing timestamps: {e}")
-            # Fall back to synthetic timestamps
-            start_time = datetime.now() - timedelta(minutes=len(results_df))
-            times = [start_time + timedelta(minutes=i) for i in range(len(results_df))]
-            results_df['EndTime'] = times
+    # Load your existing results (columnar store or CSV), timestamps already parsed
+    results_df = load_results(results_file)
 
     # Extract data
     vusers = results_df['VusersNumber'].values.reshape(-1, 1)
@@ -95,17 +63,8 @@ def main():
     future_vusers_array = np.array(future_vusers).reshape(-1, 1)
 
     # Make predictions for both historical and future data
-    with concurrent.futures.ProcessPoolExecutor(max_workers=20) as executor:
-        predict_func = partial(predict_for_vuser, predictor=predictor)
-
-        # Predict for historical data
-        historical_predictions = list(executor.map(predict_func, vusers))
-
-        # Predict for future data
-        future_predictions = list(executor.map(predict_func, future_vusers_array))
-
-    historical_predictions = np.array(historical_predictions)
-    future_predictions = np.array(future_predictions)
+    historical_predictions = predict_for_vusers(vusers, predictor)
+    future_predictions = predict_for_vusers(future_vusers_array, predictor)
 
     # Combine all timestamps for plotting
     all_times = np.concatenate([times, future_times])
@@ -156,5 +115,4 @@ def main():
 
 
 if __name__ == '__main__':
-    multiprocessing.freeze_support()
     main()
\ No newline at end of file
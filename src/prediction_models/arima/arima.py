@@ -5,12 +5,12 @@ import pandas as pd
 from statsmodels.tsa.arima.model import ARIMA
 
 from src.utils.Paths import get_results_csv_file
+from src.utils.ResultStore import load_results
 
 # Load data
-data = pd.read_csv(get_results_csv_file())
+data = load_results(get_results_csv_file())
 
 # Preprocess data
-data['EndTime'] = pd.to_datetime(data['EndTime'], format='%H:%M:%S:%f')
 data['ResponseTime[ms]'] = data['ResponseTime[ms]'].astype(float)
 
 # Train ARIMA model on ResponseTime
@@ -1,11 +1,53 @@
+import math
 import numpy as np
 import os
+from numpy.lib.stride_tricks import sliding_window_view
 from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense
+from tensorflow.keras.utils import Sequence
 from sklearn.preprocessing import MinMaxScaler
 import pandas as pd
 
 
+def sliding_windows(features, sequence_length):
+    """Windows features[i:i + sequence_length] for every i that has a following row, as a read-only view.
+
+    `features` is (rows, columns); the result is (rows - sequence_length, sequence_length, columns)
+    and shares its memory, so building it costs nothing whatever the number of rows.
+    """
+    windows = sliding_window_view(features, sequence_length, axis=0)[:len(features) - sequence_length]
+    return windows.transpose(0, 2, 1)
+
+
+class WindowBatches(Sequence):
+    """Training batches copied out of the window view one at a time, shuffled per epoch like model.fit does.
+
+    Passing the view to model.fit directly would convert all windows into one tensor of
+    rows * sequence_length copies; here only batch_size windows exist at once.
+    """
+
+    def __init__(self, X, y, batch_size=32, shuffle=True):
+        super().__init__()
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.order = np.arange(len(X))
+        self.on_epoch_end()
+
+    def __len__(self):
+        return math.ceil(len(self.X) / self.batch_size)
+
+    def __getitem__(self, batch):
+        # Sorted indices keep the gather moving forward through the underlying array
+        indices = np.sort(self.order[batch * self.batch_size:(batch + 1) * self.batch_size])
+        return self.X[indices].astype(np.float32), self.y[indices].astype(np.float32)
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.order)
+
+
 class LstmResponsePredictor:
     def __init__(self, sequence_length=5, model_path=None):
         self.sequence_length = sequence_length
@@ -35,34 +77,57 @@ class LstmResponsePredictor:
             print("Not enough data for training")
             return False
 
-        self.model.fit(X, y, epochs=epochs, batch_size=batch_size, verbose=1)
+        self.model.fit(WindowBatches(X, y, batch_size), epochs=epochs, verbose=1)
         return True
 
     def predict_response_time(self, vusers_sequence):
-        if len(vusers_sequence) < self.sequence_length:
-            pad_length = self.sequence_length - len(vusers_sequence)
-            padded_vusers = np.pad(vusers_sequence, (pad_length, 0), 'edge')
+        return self.predict_batch([vusers_sequence])[0]
+
+    def _vuser_windows(self, sequences):
+        # (sequences, sequence_length) vuser counts: shorter sequences padded with their first value, longer cut
+        if isinstance(sequences, np.ndarray) and sequences.ndim >= 2:
+            windows = sequences.reshape(len(sequences), -1).astype(float)
         else:
-            padded_vusers = vusers_sequence[-self.sequence_length:]
+            windows = [np.asarray(sequence, dtype=float).reshape(-1) for sequence in sequences]
+            if len({len(window) for window in windows}) > 1:
+                windows = [self._vuser_windows(window.reshape(1, -1))[0] for window in windows]
+            windows = np.stack(windows)
+        if windows.shape[1] < self.sequence_length:
+            windows = np.pad(windows, ((0, 0), (self.sequence_length - windows.shape[1], 0)), 'edge')
+        return windows[:, -self.sequence_length:]
 
-        fake_response = np.zeros_like(padded_vusers)
+    def predict_batch(self, sequences, chunk_size=8192):
+        """Predicts the response time after each of many vuser sequences.
 
-        input_seq = np.column_stack((
-            self.scaler_vusers.transform(padded_vusers.reshape(-1, 1)).flatten(),
-            self.scaler_response.transform(fake_response.reshape(-1, 1)).flatten()
-        )).reshape(1, self.sequence_length, 2)
+        Args:
+            sequences: Array (n, length) or (n, length, 1), or a list of sequences of any length
+            chunk_size: Sequences per forward pass; bounds the memory of the input and LSTM states
+
+        Returns:
+            Array of n predicted response times
+        """
+        if not len(sequences):
+            return np.array([])
+        windows = self._vuser_windows(sequences)
+        count = len(windows)
+
+        # Scaled in one step; the response channel is unknown at prediction time and fed as zeros
+        X = np.empty((count, self.sequence_length, 2), dtype=np.float32)
+        X[:, :, 0] = self.scaler_vusers.transform(windows.reshape(-1, 1)).reshape(count, self.sequence_length)
+        X[:, :, 1] = self.scaler_response.transform([[0]])[0, 0]
 
-        prediction = self.model.predict(input_seq)
-        return self.scaler_response.inverse_transform(prediction)[0][0]
+        predictions = np.concatenate([np.asarray(self.model.predict_on_batch(X[start:start + chunk_size]))
+                                      for start in range(0, count, chunk_size)])
+        return self.scaler_response.inverse_transform(predictions.reshape(-1, 1)).reshape(-1)
 
     def predict_optimal_vusers(self, target_response_time_ms, current_vusers, max_increase=20):
         best_vusers = current_vusers
         min_diff = float('inf')
 
-        for test_vusers in range(current_vusers, current_vusers + max_increase + 1, 5):
-            test_sequence = np.array([test_vusers] * self.sequence_length).reshape(-1, 1)
-            predicted_response = self.predict_response_time(test_sequence)
-
+        # All candidates in one forward pass; the few past the first one over target cost less than more calls
+        candidates = np.arange(current_vusers, current_vusers + max_increase + 1, 5)
+        predictions = self.predict_batch(np.repeat(candidates.reshape(-1, 1), self.sequence_length, axis=1))
+        for test_vusers, predicted_response in zip(candidates.tolist(), predictions):
             diff = abs(predicted_response - target_response_time_ms)
 
             if diff < min_diff:
@@ -81,23 +146,14 @@ class LstmResponsePredictor:
         vusers_scaled = self.scaler_vusers.fit_transform(vusers_data)
         response_scaled = self.scaler_response.fit_transform(response_times)
 
-        X, y = [], []
-
-        for i in range(len(vusers_scaled) - self.sequence_length):
-            seq = np.column_stack((
-                vusers_scaled[i:i + self.sequence_length],
-                response_scaled[i:i + self.sequence_length]
-            )).reshape(self.sequence_length, 2)
-
-            target = response_scaled[i + self.sequence_length]
-
-            X.append(seq)
-            y.append(target)
-
-        if not X:
+        if len(vusers_scaled) <= self.sequence_length:
             return np.array([]), np.array([])
 
-        return np.array(X), np.array(y)
+        # One (rows, 2) copy of the scaled data; the windows X[i] = features[i:i + sequence_length] are views of it
+        features = np.column_stack((vusers_scaled, response_scaled)).astype(np.float32)
+        X = sliding_windows(features, self.sequence_length)
+        y = features[self.sequence_length:, 1:]
+        return X, y
 
     def evaluate_predictions(self, vusers_data, actual_response_times, save_csv=True, visualize=True,
                              output_path="./src/results/predictions.csv"):
@@ -4,17 +4,16 @@ Służy również jako punkt wejścia dla kontenera Docker.
 """
 import os
 import time
-import pandas as pd
-import numpy as np
 from src.prediction_models.lstm.LstmResponsePredictor import LstmResponsePredictor
 from src.utils.Paths import get_results_csv_file
+from src.utils.ResultStore import load_result_arrays, results_available
 
 def wait_for_results_file(file_path, max_retries=30, retry_interval=10):
     """Oczekuje na pojawienie się pliku wyników."""
     print(f"Oczekiwanie na plik wyników: {file_path}")
     retries = 0
     while retries < max_retries:
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+        if results_available(file_path):
             print(f"Znaleziono plik wyników: {file_path}")
             return True
         print(f"Plik wyników jeszcze nie istnieje lub jest pusty. Próba {retries+1}/{max_retries}")
@@ -26,21 +25,17 @@ def wait_for_results_file(file_path, max_retries=30, retry_interval=10):
 
 def load_and_preprocess_data(file_path):
     """
-    Wczytuje dane z pliku CSV i przygotowuje je do trenowania modelu LSTM.
+    Wczytuje wyniki testów (magazyn kolumnowy lub plik CSV) i przygotowuje je do trenowania modelu LSTM.
     """
     try:
         print(f"Wczytywanie danych z: {file_path}")
-        data = pd.read_csv(file_path)
-
-        # Konwersja czasu
-        data['StartTime'] = pd.to_datetime(data['StartTime'], format='%H:%M:%S:%f')
-        data['EndTime'] = pd.to_datetime(data['EndTime'], format='%H:%M:%S:%f')
+        data = load_result_arrays(file_path)
 
         # Przygotowanie danych do modelu
-        vusers_data = data['VusersNumber'].values.reshape(-1, 1)
-        response_times = data['ResponseTime[ms]'].values.reshape(-1, 1)
+        vusers_data = data['VusersNumber'].reshape(-1, 1)
+        response_times = data['ResponseTime[ms]'].reshape(-1, 1)
 
-        print(f"Załadowano {len(data)} rekordów.")
+        print(f"Załadowano {len(vusers_data)} rekordów.")
         return vusers_data, response_times
     except Exception as e:
         print(f"Błąd podczas wczytywania danych: {e}")
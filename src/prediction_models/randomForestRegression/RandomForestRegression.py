@@ -6,12 +6,11 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 
+from src.utils.ResultStore import load_results
 
-def load_and_prepare_data(file_path):
-    data = pd.read_csv(file_path)
-    data['StartTime'] = pd.to_datetime(data['StartTime'], format='%H:%M:%S:%f')
-    data['EndTime'] = pd.to_datetime(data['EndTime'], format='%H:%M:%S:%f')
-    return data
+
+def load_and_prepare_data(file_path, rollup=None):
+    return load_results(file_path, rollup)
 
 
 def train_model(data):
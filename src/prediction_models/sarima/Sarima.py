@@ -6,25 +6,25 @@ import pandas as pd
 import plotly.graph_objects as go
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 
+from src.utils.ResultStore import load_results
+
 warnings.filterwarnings('ignore')
 
 
 class Sarima:
-    def __init__(self, csv_file: str):
+    def __init__(self, csv_file: str, rollup: int = None):
         """
-        Initialize the predictor with data from CSV file
+        Initialize the predictor with data from CSV file; with `rollup` (1, 10 or 60 seconds)
+        it is trained on the per-interval aggregates instead of the raw requests
         """
-        self.data = self._load_data(csv_file)
+        self.data = self._load_data(csv_file, rollup)
         self.model = None
 
-    def _load_data(self, csv_file: str) -> pd.DataFrame:
+    def _load_data(self, csv_file: str, rollup: int = None) -> pd.DataFrame:
         """
         Load and preprocess the data
         """
-        data = pd.read_csv(csv_file)
-        data['StartTime'] = pd.to_datetime(data['StartTime'], format='%H:%M:%S:%f')
-        data['EndTime'] = pd.to_datetime(data['EndTime'], format='%H:%M:%S:%f')
-        return data
+        return load_results(csv_file, rollup)
 
     def train_model(self) -> None:
         """
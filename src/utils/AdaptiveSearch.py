@@ -0,0 +1,106 @@
+import time
+
+from src.utils.LoadProfile import VuserPool
+
+
+class AdaptiveSearch:
+    """Closed-loop search for the highest vuser count whose latency percentile meets an SLA.
+
+    Every probe holds a vuser count for `warmup` seconds (not measured), then `probe_duration`
+    seconds whose rows are read back from the live stage histogram. The count doubles from
+    `start_users` until a probe misses the SLA (or an optional predictor with
+    predict_optimal_vusers suggests a smaller step), then the passing/failing bracket is bisected
+    down to `resolution` users and the best passing count is held for `confirm_duration` seconds.
+    Each probe is its own stage, so stage_stats.csv records the whole search.
+    """
+
+    def __init__(self, scenario, target_ms, percentile=95, start_users=1, max_users=1000, probe_duration=30,
+                 warmup=5, resolution=2, confirm_duration=60, max_error_rate=0.01, predictor=None):
+        self.scenario = scenario
+        self.target_ms = target_ms
+        self.percentile = percentile
+        self.start_users = max(1, start_users)
+        self.max_users = max_users
+        self.probe_duration = probe_duration
+        self.warmup = warmup
+        self.resolution = max(1, resolution)
+        self.confirm_duration = confirm_duration
+        self.max_error_rate = max_error_rate
+        self.predictor = predictor
+        self.pool = None
+        self.stage = None
+        self.probes = []
+
+    def run(self, requests):
+        if self.scenario.engine == "threads" and self.scenario.processes == 1:
+            self.pool = VuserPool(self.scenario, requests)  # Probes resize one pool, as in run_profile
+        try:
+            best, failed = 0, None
+            users = self.start_users
+            while True:
+                if not self._probe(users, f"search-{users}"):
+                    failed = users
+                    break
+                best = users
+                if users >= self.max_users:
+                    break
+                users = self._next_users(users)
+            while failed is not None and failed - best > self.resolution:
+                users = (best + failed) // 2
+                if self._probe(users, f"search-{users}"):
+                    best = users
+                else:
+                    failed = users
+
+            confirmed = best > 0 and self._probe(best, f"confirm-{best}", self.confirm_duration)
+        finally:
+            if self.pool is not None:
+                self.pool.stop()
+            if self.stage is not None:
+                self.scenario.end_stage(self.stage)
+                self.stage = None
+
+        print(f"Capacity search: {best} users meet p{self.percentile} <= {self.target_ms} ms "
+              f"({'confirmed' if confirmed else 'not confirmed'}) after {len(self.probes)} probes")
+        return {"users": best, "confirmed": confirmed, "probes": self.probes}
+
+    def _next_users(self, users):
+        upper = min(users * 2, self.max_users)
+        if self.predictor is None:
+            return upper
+        try:
+            suggested = int(self.predictor.predict_optimal_vusers(self.target_ms, users, max_increase=upper - users))
+        except Exception as e:
+            print(f"Predictor unavailable, doubling instead: {e}")
+            return upper
+        # The model only shortens the step; bisection still corrects an optimistic guess
+        return min(max(suggested, users + 1), upper)
+
+    def _probe(self, users, stage, duration=None):
+        if self.warmup > 0:
+            self._hold(users, f"{stage}-warmup", self.warmup)
+        self._hold(users, stage, duration or self.probe_duration)
+
+        self.scenario.get_writer().flush()
+        histogram, errors = self.scenario.stats.stage_histogram(stage)
+        latency = histogram.percentile(self.percentile)
+        error_rate = errors / histogram.count if histogram.count else 1.0
+        passed = histogram.count > 0 and latency <= self.target_ms and error_rate <= self.max_error_rate
+        self.probes.append({"users": users, "stage": stage, "count": histogram.count, "latency_ms": latency,
+                            "error_rate": round(error_rate, 4), "passed": passed})
+        print(f"Probe {stage}: {users} users, p{self.percentile} {latency} ms, errors {error_rate:.2%} "
+              f"-> {'pass' if passed else 'fail'}")
+        return passed
+
+    def _hold(self, users, stage, duration):
+        # Same ordering as run_profile: resize, retag new rows, then close the previous stage
+        if self.pool is not None:
+            self.pool.resize(users)
+        previous, self.stage = self.stage, stage
+        self.scenario.stage = stage
+        if previous is not None:
+            self.scenario.end_stage(previous)
+        if self.pool is not None:
+            time.sleep(duration)
+        else:
+            self.scenario._speed(users, duration)
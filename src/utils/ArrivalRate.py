@@ -0,0 +1,132 @@
+import itertools
+import queue
+import random
+import threading
+import time
+
+from src.utils.Pacing import get_timer_wheel
+
+
+class ArrivalRate:
+    """Open-model executor: requests start on an arrival schedule, independent of response times.
+
+    Arrivals are either evenly spaced ("constant") or exponentially distributed ("poisson") at
+    `rps` per second. At most `max_in_flight` requests run at once; an arrival that finds no free
+    slot is dropped and counted, one that starts more than `late_threshold` seconds after its
+    scheduled time is counted as late. Latencies are also recorded from the scheduled time, so a
+    slow server cannot hide the requests it delayed (coordinated omission). In flow mode an arrival
+    is a new user walking the whole request chain with a fresh context. replay() takes the arrivals
+    from a recorded log instead of a rate.
+    """
+
+    arrivals = ("constant", "poisson")
+
+    def __init__(self, scenario, max_in_flight=100, arrivals="constant", late_threshold=0.01):
+        if arrivals not in ArrivalRate.arrivals:
+            raise ValueError(f"Unknown arrivals '{arrivals}', expected one of {ArrivalRate.arrivals}")
+        self.scenario = scenario
+        self.max_in_flight = max_in_flight
+        self.arrival_mode = arrivals
+        self.late_threshold = late_threshold
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        self.stats = {"scheduled": 0, "completed": 0, "dropped": 0, "late": 0, "failed": 0, "exhausted": 0}
+        self.jobs = queue.Queue()
+        self.workers = []
+
+    def run(self, steps, requests):
+        # steps: [(rps, duration), ...] executed back to back on the same worker pool
+        self._start_workers()
+        chain_cycle = itertools.cycle(self.scenario.vuser_chains(requests))
+        previous = None
+        for rps, duration in steps:
+            self.scenario.stage = f"rate-{rps}"
+            if previous not in (None, self.scenario.stage):
+                self.scenario.end_stage(previous)  # New rows are tagged with the next step from here on
+            previous = self.scenario.stage
+            self._schedule(rps, duration, chain_cycle)
+        self._stop_workers()
+        if previous is not None:
+            self.scenario.end_stage(previous)
+        return self.stats
+
+    def replay(self, entries, speed=1.0, stage="replay"):
+        # entries: (seconds since the first entry, Request, label) in order, e.g. from read_replay;
+        # speed 2 replays the recorded traffic twice as fast. The iterable is consumed as it is scheduled.
+        self._start_workers()
+        self.scenario.stage = stage
+        wheel = get_timer_wheel()
+        start = time.perf_counter()
+        for offset, request, label in entries:
+            scheduled = start + offset / speed
+            wheel.wait_until(scheduled)
+            self._arrive([request], scheduled, label)
+        self._stop_workers()
+        return self.stats
+
+    def _start_workers(self):
+        for _ in range(self.max_in_flight):
+            worker = threading.Thread(target=self._work, daemon=True)
+            self.workers.append(worker)
+            worker.start()
+
+    def _stop_workers(self):
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def _schedule(self, rps, duration, chain_cycle):
+        # The wheel thread spins before each deadline with the GIL released, so returning workers are not held up
+        wheel = get_timer_wheel()
+        start = time.perf_counter()
+        end = start + duration
+        scheduled = start
+        for index in itertools.count():
+            if self.arrival_mode == "poisson":
+                scheduled += random.expovariate(rps)
+            else:
+                scheduled = start + index / rps  # Computed from the start, so rounding never drifts
+            if scheduled >= end:
+                break
+            wheel.wait_until(scheduled)
+            self._arrive(next(chain_cycle), scheduled)
+
+    def _arrive(self, chain, scheduled, label=None):
+        self.stats["scheduled"] += 1
+        with self.in_flight_lock:
+            if self.in_flight >= self.max_in_flight:
+                self.stats["dropped"] += 1
+                return
+            self.in_flight += 1
+        self.jobs.put((chain, scheduled, label))
+
+    def _work(self):
+        session = self.scenario.create_session()
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                chain, scheduled, label = job
+                delay_ns = max(0, time.perf_counter_ns() - int(scheduled * 1e9))
+                late = delay_ns > self.late_threshold * 1e9
+                outcome = "completed"
+                context = self.scenario.new_context()
+                if not self.scenario.feed(context):
+                    chain, outcome = (), "exhausted"  # A unique feeder ran out of rows
+                for request in chain:
+                    timing = self.scenario.execute(request, session, context)
+                    timing.delay_ns = delay_ns
+                    self.scenario.log_timing(self.in_flight, label or request.url, timing, self.scenario.stage)
+                    if timing.error:
+                        outcome = "failed"
+                        break  # The rest of this user's chain depends on the failed step
+                with self.in_flight_lock:
+                    self.in_flight -= 1
+                    self.stats[outcome] += 1
+                    self.stats["late"] += late
+        finally:
+            if session is not None:
+                session.close()
@@ -0,0 +1,188 @@
+import json
+import re
+import string
+
+_formatter = string.Formatter()
+_simple_name = re.compile(r"^[A-Za-z_]\w*$")
+_json_path_step = re.compile(r"\.([A-Za-z_][\w-]*)|\[(\d+)\]|\['([^']*)'\]|\[\"([^\"]*)\"\]")
+
+
+class Template:
+    """str.format-style template parsed once and rendered against a vuser context on every request.
+
+    Same syntax as str.format ("{token}", "{user[id]}", "{{" for a literal brace), so templates
+    written for the old build-time set_body keep working.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = []
+        for literal, field, spec, conversion in _formatter.parse(text):
+            simple = field is not None and _simple_name.match(field) and not spec and not conversion
+            self.parts.append((literal, field, spec, conversion, bool(simple)))
+        self.static = all(field is None for _, field, _, _, _ in self.parts)
+        if self.static:
+            self.text = "".join(literal for literal, _, _, _, _ in self.parts)  # Unescape "{{" and "}}"
+
+    def render(self, context):
+        if self.static:
+            return self.text
+        rendered = []
+        for literal, field, spec, conversion, simple in self.parts:
+            rendered.append(literal)
+            if field is None:
+                continue
+            if simple:
+                rendered.append(str(context[field]))
+                continue
+            value = _formatter.get_field(field, (), context)[0]
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            rendered.append(format(value, spec))
+        return "".join(rendered)
+
+
+def compile_template(value):
+    # Strings become templates, dicts (headers) are compiled value by value, anything else is kept
+    if isinstance(value, str):
+        return Template(value)
+    if isinstance(value, dict):
+        return {key: compile_template(item) for key, item in value.items()}
+    return value
+
+
+def render_template(compiled, context):
+    if isinstance(compiled, Template):
+        return compiled.render(context)
+    if isinstance(compiled, dict):
+        return {key: render_template(item, context) for key, item in compiled.items()}
+    return compiled
+
+
+class JsonPathExtractor:
+    """Saves a value of the JSON body, addressed by a simple path: $.user.id, $.items[0]['name']."""
+
+    type = "jsonpath"
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.steps = []
+        position = 1 if path.startswith("$") else 0
+        while position < len(path):
+            match = _json_path_step.match(path, position)
+            if match is None:
+                raise ValueError(f"Unsupported JSONPath '{path}' at position {position}")
+            key, index, quoted, double_quoted = match.groups()
+            self.steps.append(int(index) if index is not None else key or quoted or double_quoted)
+            position = match.end()
+
+    def extract(self, response):
+        value = response.json()
+        for step in self.steps:
+            try:
+                value = value[step]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return value
+
+    def to_dict(self):
+        return {"type": self.type, "name": self.name, "path": self.path}
+
+
+class RegexExtractor:
+    """Saves the first match of a regular expression in the body (its first group, if it has one)."""
+
+    type = "regex"
+
+    def __init__(self, name, pattern, group=None):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.group = group if group is not None else (1 if self.pattern.groups else 0)
+
+    def extract(self, response):
+        match = self.pattern.search(response.text())
+        return match.group(self.group) if match else None
+
+    def to_dict(self):
+        return {"type": self.type, "name": self.name, "pattern": self.pattern.pattern, "group": self.group}
+
+
+class HeaderExtractor:
+    """Saves a response header (case-insensitive)."""
+
+    type = "header"
+
+    def __init__(self, name, header):
+        self.name = name
+        self.header = header
+
+    def extract(self, response):
+        return response.headers.get(self.header)
+
+    def to_dict(self):
+        return {"type": self.type, "name": self.name, "header": self.header}
+
+
+EXTRACTORS = {extractor.type: extractor for extractor in (JsonPathExtractor, RegexExtractor, HeaderExtractor)}
+
+
+def extractor_from_dict(data):
+    data = dict(data)
+    return EXTRACTORS[data.pop("type")](**data)
+
+
+class ReceivedResponse:
+    """Body and headers of a response that was already downloaded; text and JSON are decoded once."""
+
+    def __init__(self, content, headers, encoding=None):
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or "utf-8"
+        self._text = None
+        self._json = None
+
+    def text(self):
+        if self._text is None:
+            self._text = self.content.decode(self.encoding, errors="replace")
+        return self._text
+
+    def json(self):
+        if self._json is None:
+            try:
+                self._json = json.loads(self.text())
+            except ValueError:
+                self._json = {}
+        return self._json
+
+
+class SharedContext(dict):
+    """Vuser context outside flow mode, where every vuser repeats a single request.
+
+    As with the single shared dict used before per-vuser contexts, values a request saves are
+    published to `shared` (Request.shared_variables), and keys this vuser has not set are read from
+    there, so a template can use a value saved by another request. Feeder rows (added with update)
+    stay with the vuser.
+    """
+
+    def __init__(self, shared):
+        super().__init__()
+        self.shared = shared
+
+    def __setitem__(self, key, value):
+        self.shared[key] = value
+
+    def __missing__(self, key):
+        if key in self.shared:
+            return self.shared[key]
+        raise KeyError(f"'{key}' is not set: no response has been saved under it yet. Outside flow mode a value "
+                       f"saved by another request is available once that request has received it; set an "
+                       f"initial value in Request.shared_variables or use flow mode")
+
+
+def apply_extractors(extractors, response, context):
+    # Values that are not found keep the previous value of the variable
+    for extractor in extractors:
+        value = extractor.extract(response)
+        if value is not None:
+            context[extractor.name] = value
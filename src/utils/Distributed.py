@@ -0,0 +1,183 @@
+import json
+import socket
+import threading
+import time
+
+from src.utils.Request import Request
+from src.utils.Scenario import Scenario
+
+
+def send_message(sock, lock, message):
+    with lock:
+        sock.sendall((json.dumps(message) + "\n").encode())
+
+
+def read_messages(sock):
+    with sock.makefile("r", encoding="utf-8") as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+class SocketResultSink:
+    """ResultWriter sink of an agent: streams row batches back to the coordinator."""
+
+    def __init__(self, sock, lock):
+        self.sock = sock
+        self.lock = lock
+
+    def write(self, rows):
+        send_message(self.sock, self.lock, {"type": "rows", "rows": rows})
+
+    def close(self):
+        pass
+
+
+class Agent:
+    """Load generator process controlled by a Coordinator over TCP (one JSON message per line).
+
+    The coordinator measures the clock offset, sends the scenario, its requests, the load profile
+    and this agent's shard, then a start time. The agent runs the profile from that instant and
+    streams its result rows and stage ends back.
+    """
+
+    def __init__(self, host="0.0.0.0", port=9100):
+        self.host = host
+        self.port = port
+
+    def serve_forever(self):
+        with socket.create_server((self.host, self.port)) as server:
+            print(f"Agent listening on {self.host}:{self.port}")
+            while True:
+                sock, address = server.accept()
+                print(f"Coordinator connected from {address[0]}:{address[1]}")
+                with sock:
+                    try:
+                        self.handle(sock)
+                    except (OSError, ValueError) as e:
+                        print(f"Coordinator session failed: {e}")
+
+    def handle(self, sock):
+        lock = threading.Lock()
+        config = None
+        for message in read_messages(sock):
+            if message["type"] == "clock":
+                send_message(sock, lock, {"type": "clock", "time_ns": time.time_ns()})
+            elif message["type"] == "config":
+                config = message
+            elif message["type"] == "start":
+                self.run(sock, lock, config, message["at_ns"])
+                return
+
+    def run(self, sock, lock, config, at_ns):
+        scenario = Scenario(**config["scenario"])
+        scenario.shard = tuple(config["shard"])
+        Scenario.requests = [Request.from_dict(data) for data in config["requests"]]
+        Request.shared_variables = config["variables"]
+        Scenario.start_writer([SocketResultSink(sock, lock)])
+        Scenario.stage_listeners = [
+            lambda stage: send_message(sock, lock, {"type": "stage_end", "stage": stage})]
+
+        delay = (at_ns - time.time_ns()) / 1e9
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            scenario.profile(config["stages"])
+        finally:
+            Scenario.close_writer()
+            Scenario.stage_listeners = []
+            send_message(sock, lock, {"type": "done"})
+
+
+class Coordinator:
+    """Splits a load profile across agents and merges their results into this process's writer.
+
+    Each "host:port" entry is resolved and every address becomes an agent, so a scaled
+    docker-compose service name reaches all of its replicas.
+    """
+
+    def __init__(self, agents, connect_timeout=120, start_delay=2.0):
+        self.addresses = self._resolve(agents)
+        self.connect_timeout = connect_timeout
+        self.start_delay = start_delay
+
+    @staticmethod
+    def _resolve(agents):
+        addresses = []
+        for agent in agents:
+            host, port = agent.rsplit(":", 1)
+            # IPv4 only, so a host with both address families is not counted as two agents
+            for info in socket.getaddrinfo(host, int(port), socket.AF_INET, socket.SOCK_STREAM):
+                if info[4][:2] not in addresses:
+                    addresses.append(info[4][:2])
+        return addresses
+
+    def _connect(self, address):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return socket.create_connection(address, timeout=10)
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                print(f"Waiting for agent {address[0]}:{address[1]}...")
+                time.sleep(2)
+
+    def _clock_offset(self, sock, lock, messages, samples=5):
+        # NTP-style estimate from the round trip with the smallest delay
+        best = None
+        for _ in range(samples):
+            sent = time.time_ns()
+            send_message(sock, lock, {"type": "clock"})
+            agent_time = next(messages)["time_ns"]
+            received = time.time_ns()
+            if best is None or received - sent < best[0]:
+                best = (received - sent, agent_time - (sent + received) // 2)
+        return best[1]
+
+    def run(self, scenario, stages):
+        agents = []
+        for index, address in enumerate(self.addresses):
+            sock = self._connect(address)
+            sock.settimeout(None)
+            lock = threading.Lock()
+            messages = read_messages(sock)
+            offset = self._clock_offset(sock, lock, messages)
+            print(f"Agent {address[0]}:{address[1]} clock offset {offset / 1e6:.3f} ms")
+            send_message(sock, lock, {"type": "config", "scenario": scenario.settings(),
+                                      "requests": [request.to_dict() for request in Scenario.requests],
+                                      "variables": Request.shared_variables,
+                                      "stages": stages, "shard": [index, len(self.addresses)]})
+            agents.append((sock, lock, messages, offset))
+
+        start_ns = time.time_ns() + int(self.start_delay * 1e9)
+        for sock, lock, _, offset in agents:
+            send_message(sock, lock, {"type": "start", "at_ns": start_ns + offset})
+
+        stage_ends = {}
+        stage_lock = threading.Lock()
+        readers = [threading.Thread(target=self._receive, args=(agent, len(agents), stage_ends, stage_lock))
+                   for agent in agents]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        for sock, _, _, _ in agents:
+            sock.close()
+
+    def _receive(self, agent, agent_count, stage_ends, stage_lock):
+        sock, _, messages, offset = agent
+        writer = Scenario.get_writer()
+        for message in messages:
+            if message["type"] == "rows":
+                for row in message["rows"]:
+                    row["start_ns"] -= offset  # Agent clock -> coordinator clock
+                    row["end_ns"] -= offset
+                writer.put_many(message["rows"])
+            elif message["type"] == "stage_end":
+                with stage_lock:
+                    stage_ends[message["stage"]] = stage_ends.get(message["stage"], 0) + 1
+                    complete = stage_ends[message["stage"]] == agent_count
+                if complete:
+                    Scenario.end_stage(message["stage"])
+            elif message["type"] == "done":
+                return
@@ -0,0 +1,151 @@
+import csv
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import threading
+
+import numpy as np
+
+INDEX_CHUNK = 64 * 1024 * 1024  # Bytes scanned at once while indexing, bounds the temporary arrays
+_open_lock = threading.Lock()
+
+
+def build_index(data):
+    # (start, end) byte offsets of every non-blank line; end is the position of its newline
+    size = len(data)
+    if not size:
+        return np.zeros((0, 2), dtype=np.int64)
+    view = np.frombuffer(data, dtype=np.uint8)
+    ends = np.concatenate([np.flatnonzero(view[offset:offset + INDEX_CHUNK] == 10) + offset
+                           for offset in range(0, size, INDEX_CHUNK)])
+    if not len(ends) or ends[-1] != size - 1:
+        ends = np.append(ends, size)  # Last line without a trailing newline
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    blank = (lengths == 0) | ((lengths == 1) & (view[np.minimum(starts, size - 1)] == 13))  # "\n" or "\r\n"
+    return np.stack([starts[~blank], ends[~blank]], axis=1).astype(np.int64)
+
+
+def load_index(path, data):
+    """Line index of `path`, cached next to it as <path>.idx.npy and memory-mapped from there.
+
+    The cache holds the data file's size and mtime in its first row and is rebuilt when they change,
+    so worker processes share one index in the page cache instead of scanning the file each.
+    """
+    stat = os.stat(path)
+    cache = f"{path}.idx.npy"
+    try:
+        cached = np.load(cache, mmap_mode="r")
+        if tuple(cached[0]) == (stat.st_size, stat.st_mtime_ns):
+            return cached[1:]
+    except (OSError, ValueError, IndexError):
+        pass
+    index = build_index(data)
+    try:
+        # Written aside and renamed, so a process reading the cache never sees half of it
+        temporary = f"{cache}.{os.getpid()}.npy"
+        np.save(temporary, np.concatenate(([[stat.st_size, stat.st_mtime_ns]], index)).astype(np.int64))
+        os.replace(temporary, cache)
+    except OSError as e:
+        print(f"Line index of {path} not cached: {e}")  # E.g. a read-only data directory
+    return index
+
+
+class Feeder:
+    """Rows of a CSV (with a header) or JSON Lines file fed into the vuser contexts.
+
+    The file is memory-mapped and only a line index is built, so a file of millions of rows costs
+    one line parse per iteration and, in forked worker processes, no copy. Modes:
+    "sequential" hands out the rows in order and wraps around, "random" picks any row, "unique"
+    hands out every row at most once and then reports the feeder as exhausted. Sequential and
+    unique rows are split between agents; worker processes draw from one position shared with the
+    parent (share_position), so no two generators share a row and later stages continue after it.
+    Row values are merged into the context ("{user_id}"), or kept under `name` ("{user[user_id]}").
+    """
+
+    modes = ("sequential", "random", "unique")
+
+    def __init__(self, path, mode="sequential", name=None):
+        if mode not in Feeder.modes:
+            raise ValueError(f"Unknown feeder mode '{mode}', expected one of {Feeder.modes}")
+        self.path = path
+        self.mode = mode
+        self.name = name
+        self.format = "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+        self.counter = itertools.count()
+        self.shared = None  # Position in shared memory once worker processes draw from this feeder
+        self.columns = None
+        self._data = None
+        self._index = None
+
+    def to_dict(self):
+        return {"path": self.path, "mode": self.mode, "name": self.name}
+
+    @staticmethod
+    def from_dict(data):
+        return Feeder(data["path"], data.get("mode", "sequential"), data.get("name"))
+
+    def __getstate__(self):
+        # A spawned worker maps the file again; the cached index makes that cheap
+        state = dict(self.__dict__)
+        state["_data"] = state["_index"] = None
+        return state
+
+    def share_position(self):
+        # Called before forking workers; they inherit the value, so their positions and the parent's stay one
+        if self.shared is None:
+            self.shared = multiprocessing.Value("q", next(self.counter))
+
+    def _position(self):
+        if self.shared is None:
+            return next(self.counter)  # itertools.count is atomic under the GIL, no lock needed
+        with self.shared.get_lock():
+            position = self.shared.value
+            self.shared.value = position + 1
+        return position
+
+    def _open(self):
+        with _open_lock:  # The first vusers of a run all ask for a row at once
+            if self._index is not None:
+                return
+            with open(self.path, "rb") as file:
+                empty = not os.fstat(file.fileno()).st_size  # mmap cannot map an empty file
+                data = b"" if empty else mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            index = load_index(self.path, data)
+            if self.format == "csv" and len(index):
+                self.columns = next(csv.reader([self._line(data, index[0])]))
+                index = index[1:]
+            self._data, self._index = data, index
+
+    @staticmethod
+    def _line(data, bounds):
+        return data[int(bounds[0]):int(bounds[1])].decode("utf-8").rstrip("\r")
+
+    def __len__(self):
+        if self._index is None:
+            self._open()
+        return len(self._index)
+
+    def row(self, position):
+        if self._index is None:
+            self._open()
+        line = self._line(self._data, self._index[position])
+        if self.format == "jsonl":
+            return json.loads(line)
+        return dict(zip(self.columns, next(csv.reader([line]))))
+
+    def next(self, index=0, count=1):
+        # Row for the next iteration of agent `index` of `count`; None once a unique feeder has run out
+        rows = len(self)
+        if self.mode == "random":
+            return self.row(random.randrange(rows)) if rows else None
+        share = (rows - index + count - 1) // count  # Rows index, index + count, ... of this generator
+        if share <= 0:
+            return None
+        position = self._position()
+        if self.mode == "unique" and position >= share:
+            return None
+        return self.row(index + (position % share) * count)
@@ -0,0 +1,318 @@
+import bisect
+import csv
+import os
+import threading
+import time
+
+from src.utils.Paths import open_result_file
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+STAGE_STATS_HEADER = ["Stage", "URL", "Count", "Errors", "ErrorRate", "ErrorClasses", "Throughput[rps]",
+                      "Duration[s]",
+                      "Mean[ms]", "Min[ms]", "P50[ms]", "P90[ms]", "P99[ms]", "P99.9[ms]", "Max[ms]",
+                      "CorrectedP50[ms]", "CorrectedP90[ms]", "CorrectedP99[ms]", "CorrectedP99.9[ms]",
+                      "CorrectedMax[ms]"]
+
+
+class LatencyHistogram:
+    """HDR-style log-linear latency histogram with constant memory and mergeable counts.
+
+    Values are recorded in microseconds. Below 2**significant_bits every value has its own bucket;
+    above, every power of two is split into 2**(significant_bits - 1) buckets, so any percentile
+    is reported within 1 / 2**(significant_bits - 1) of the true value (0.8% with the default 8).
+    """
+
+    def __init__(self, significant_bits=8, max_value_us=3_600_000_000):
+        self.significant_bits = significant_bits
+        self.linear = 1 << significant_bits
+        self.half = self.linear >> 1
+        self.max_value_us = max_value_us
+        self.counts = [0] * (self._index(max_value_us) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index(self, value):
+        if value < self.linear:
+            return value
+        shift = value.bit_length() - self.significant_bits
+        return self.linear + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def _lowest(self, index):
+        # Smallest value that falls into bucket `index`
+        if index < self.linear:
+            return index
+        shift, offset = divmod(index - self.linear, self.half)
+        return (offset + self.half) << (shift + 1)
+
+    def _highest(self, index):
+        return self._lowest(index + 1) - 1
+
+    def record(self, value_ms):
+        value = min(max(int(value_ms * 1000), 0), self.max_value_us)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total_us += value
+        self.max_us = max(self.max_us, value)
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        return self
+
+    def percentile(self, percentile):
+        """Latency in ms below which `percentile` percent of the recorded values fall."""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, -(-self.count * percentile // 100))  # ceil without float rounding surprises
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._highest(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def count_at_or_below(self, value_ms):
+        limit = self._index(min(int(value_ms * 1000), self.max_value_us))
+        return sum(self.counts[:limit + 1])
+
+    def mean(self):
+        return self.total_us / self.count / 1000 if self.count else 0.0
+
+    def regroup(self, bounds_ms):
+        """Recorded counts per bucket of the ascending upper bounds `bounds_ms`; the last bucket also takes
+        anything above its bound. Values count at the top of their own bucket, as percentile() reports them."""
+        bounds_us = [bound * 1000 for bound in bounds_ms]
+        counts = [0] * len(bounds_us)
+        for index, count in enumerate(self.counts):
+            if count:
+                value = min(self._highest(index), self.max_us)
+                counts[min(bisect.bisect_left(bounds_us, value), len(counts) - 1)] += count
+        return counts
+
+    def minimum(self):
+        return (self.min_us or 0) / 1000
+
+    def maximum(self):
+        return self.max_us / 1000
+
+    def to_dict(self):
+        # Sparse form, small enough to send between processes or hosts
+        return {"significant_bits": self.significant_bits, "max_value_us": self.max_value_us,
+                "counts": {index: count for index, count in enumerate(self.counts) if count},
+                "count": self.count, "total_us": self.total_us, "min_us": self.min_us, "max_us": self.max_us}
+
+    @staticmethod
+    def from_dict(data):
+        histogram = LatencyHistogram(data["significant_bits"], data["max_value_us"])
+        for index, count in data["counts"].items():
+            histogram.counts[int(index)] = count
+        histogram.count = data["count"]
+        histogram.total_us = data["total_us"]
+        histogram.min_us = data["min_us"]
+        histogram.max_us = data["max_us"]
+        return histogram
+
+
+class StageStats:
+    """Counters and histograms of one stage, per URL.
+
+    Each URL has a histogram of the measured latencies and one of the latencies from the intended
+    start (coordinated-omission corrected); both are equal when no request was sent late.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.corrected = {}
+        self.errors = {}
+        self.error_classes = {}  # url -> {error class: count}
+        self.first_ns = None
+        self.last_ns = None
+
+    def record(self, row):
+        url = row["url"]
+        histogram = self.histograms.get(url)
+        if histogram is None:
+            histogram = self.histograms[url] = LatencyHistogram()
+            self.corrected[url] = LatencyHistogram()
+            self.errors[url] = 0
+            self.error_classes[url] = {}
+        histogram.record(row["response_ms"])
+        self.corrected[url].record(row.get("corrected_ms", row["response_ms"]))
+        error = row.get("error")
+        if error:
+            self.errors[url] += 1
+            classes = self.error_classes[url]
+            classes[error] = classes.get(error, 0) + 1
+        self.first_ns = row["start_ns"] if self.first_ns is None else min(self.first_ns, row["start_ns"])
+        self.last_ns = row["end_ns"] if self.last_ns is None else max(self.last_ns, row["end_ns"])
+
+    def summary(self, stage):
+        duration = (self.last_ns - self.first_ns) / 1e9 if self.first_ns is not None else 0.0
+        rows = []
+        combined, combined_corrected, combined_classes = LatencyHistogram(), LatencyHistogram(), {}
+        for url, histogram in self.histograms.items():
+            combined.merge(histogram)
+            combined_corrected.merge(self.corrected[url])
+            for error, count in self.error_classes[url].items():
+                combined_classes[error] = combined_classes.get(error, 0) + count
+            rows.append(_summary_row(stage, url, histogram, self.corrected[url], self.error_classes[url], duration))
+        if len(self.histograms) > 1:
+            rows.append(_summary_row(stage, "ALL", combined, combined_corrected, combined_classes, duration))
+        return rows
+
+
+def _summary_row(stage, url, histogram, corrected, error_classes, duration):
+    errors = sum(error_classes.values())
+    return {
+        "Stage": stage,
+        "URL": url,
+        "Count": histogram.count,
+        "Errors": errors,
+        "ErrorRate": round(errors / histogram.count, 4) if histogram.count else 0.0,
+        "ErrorClasses": " ".join(f"{error}:{count}" for error, count in sorted(error_classes.items())),
+        "Throughput[rps]": round(histogram.count / duration, 3) if duration else 0.0,
+        "Duration[s]": round(duration, 3),
+        "Mean[ms]": round(histogram.mean(), 3),
+        "Min[ms]": histogram.minimum(),
+        "P50[ms]": histogram.percentile(50),
+        "P90[ms]": histogram.percentile(90),
+        "P99[ms]": histogram.percentile(99),
+        "P99.9[ms]": histogram.percentile(99.9),
+        "Max[ms]": histogram.maximum(),
+        "CorrectedP50[ms]": corrected.percentile(50),
+        "CorrectedP90[ms]": corrected.percentile(90),
+        "CorrectedP99[ms]": corrected.percentile(99),
+        "CorrectedP99.9[ms]": corrected.percentile(99.9),
+        "CorrectedMax[ms]": corrected.maximum(),
+    }
+
+
+class StatsAggregator:
+    """ResultWriter sink that keeps live latency statistics at constant memory.
+
+    It holds per-stage, per-URL histograms, plus per-second histograms for the last
+    `window_seconds` seconds, which give live percentiles. When a stage ends its summary is
+    appended to `stats_file` and the stage's histograms are released. Run totals per URL and the
+    latest vuser count and stage are kept for the live metrics endpoint. Rows of an ended stage
+    that finished before it ended (a vuser that read the stage just before it changed) only count
+    towards the run totals, in `late_rows`, instead of reopening the stage; a stage run again
+    later starts afresh.
+    """
+
+    def __init__(self, stats_file=None, window_seconds=60):
+        self.stats_file = stats_file
+        self.window_seconds = window_seconds
+        self.stages = {}
+        self.seconds = {}
+        self.totals = StageStats()
+        self.vusers = 0
+        self.stage = ""
+        self.closed = {}  # stage -> epoch ns it ended at
+        self.late_rows = 0
+        self.lock = threading.Lock()
+
+    def write(self, rows):
+        with self.lock:
+            for row in rows:
+                stage = self.stages.get(row["stage"])
+                if stage is None:
+                    if row["end_ns"] <= self.closed.get(row["stage"], -1):
+                        self.late_rows += 1  # Its summary has been written already
+                    else:
+                        stage = self.stages[row["stage"]] = StageStats()
+                if stage is not None:
+                    stage.record(row)
+                self.totals.record(row)
+
+                second = row["end_ns"] // 1_000_000_000
+                bucket = self.seconds.get(second)
+                if bucket is None:
+                    bucket = self.seconds[second] = [LatencyHistogram(), 0]
+                    for old in [s for s in self.seconds if s <= second - self.window_seconds]:
+                        del self.seconds[old]
+                bucket[0].record(row["response_ms"])
+                bucket[1] += 1 if row.get("error") else 0
+            if rows:
+                self.vusers = rows[-1]["vusers"]
+                self.stage = rows[-1]["stage"]
+
+    def close(self):
+        pass
+
+    def window(self, seconds=10, now_ns=None):
+        """Merged histogram and error count of the last `seconds` complete and current seconds."""
+        with self.lock:
+            latest = now_ns // 1_000_000_000 if now_ns is not None else max(self.seconds, default=0)
+            histogram, errors = LatencyHistogram(), 0
+            for second, (bucket, bucket_errors) in self.seconds.items():
+                if latest - seconds < second <= latest:
+                    histogram.merge(bucket)
+                    errors += bucket_errors
+            return histogram, errors
+
+    def url_totals(self):
+        """Copies of the run's per-URL histograms and error classes: {url: (histogram, {error: count})}."""
+        with self.lock:
+            return {url: (LatencyHistogram().merge(histogram), dict(self.totals.error_classes[url]))
+                    for url, histogram in self.totals.histograms.items()}
+
+    def stage_histogram(self, stage):
+        """Merged histogram and error count of a running stage, across its URLs."""
+        with self.lock:
+            stats = self.stages.get(stage)
+            combined = LatencyHistogram()
+            if stats is None:
+                return combined, 0
+            for histogram in stats.histograms.values():
+                combined.merge(histogram)
+            return combined, sum(stats.errors.values())
+
+    def end_stage(self, stage):
+        with self.lock:
+            stats = self.stages.pop(stage, None)
+            self.closed[stage] = time.time_ns()
+        if stats is None:
+            return []
+        summary = stats.summary(stage)
+        if self.stats_file:
+            new_file = not os.path.exists(self.stats_file) or os.path.getsize(self.stats_file) == 0
+            with open_result_file(self.stats_file, mode='a', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=STAGE_STATS_HEADER)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(summary)
+        for row in summary:
+            print(f"Stage {row['Stage']} {row['URL']}: {row['Count']} requests, "
+                  f"{row['Throughput[rps]']} rps, errors {row['ErrorRate']:.2%} {row['ErrorClasses']}, "
+                  f"p50 {row['P50[ms]']} ms, p90 {row['P90[ms]']} ms, p99 {row['P99[ms]']} ms, "
+                  f"p99.9 {row['P99.9[ms]']} ms (corrected p99 {row['CorrectedP99[ms]']} ms)")
+        return summary
+
+
+class SampledSink:
+    """Passes every `every`-th row to the wrapped sink, for optional raw-row logging."""
+
+    def __init__(self, sink, every):
+        self.sink = sink
+        self.every = every
+        self.seen = 0
+
+    def write(self, rows):
+        start = (-self.seen) % self.every
+        self.seen += len(rows)
+        sampled = rows[start::self.every]
+        if sampled:
+            self.sink.write(sampled)
+
+    def close(self):
+        self.sink.close()
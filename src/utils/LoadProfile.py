@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+
+from src.utils.Pacing import get_timer_wheel
+
+STAGE_TYPES = ("step", "ramp", "spike", "soak")
+
+
+def load_profile(path):
+    """Reads a load profile from a JSON or YAML file.
+
+    The file holds a list of stages (or {"stages": [...]}), each one of:
+        {"type": "step",  "users": 50, "duration": 60}
+        {"type": "ramp",  "from": 50, "to": 150, "duration": 120}
+        {"type": "spike", "users": 300, "duration": 10}
+        {"type": "soak",  "users": 100, "duration": 3600}
+    with an optional "id" used to tag the result rows of the stage.
+    """
+    with open(path) as file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            import yaml  # Optional, only needed for YAML profiles
+            profile = yaml.safe_load(file)
+        else:
+            profile = json.load(file)
+    return parse_profile(profile)
+
+
+def parse_profile(profile):
+    stages = profile["stages"] if isinstance(profile, dict) else profile
+    parsed = []
+    for index, stage in enumerate(stages):
+        stage_type = stage.get("type", "step")
+        if stage_type not in STAGE_TYPES:
+            raise ValueError(f"Unknown stage type '{stage_type}', expected one of {STAGE_TYPES}")
+        if stage_type == "ramp" or "users" not in stage:  # Parsed stages only carry from/to
+            start_users, end_users = int(stage["from"]), int(stage["to"])
+        else:
+            start_users = end_users = int(stage["users"])
+        parsed.append({
+            "id": str(stage.get("id", f"{index + 1}-{stage_type}")),
+            "type": stage_type,
+            "from": start_users,
+            "to": end_users,
+            "duration": float(stage["duration"]),
+        })
+    return parsed
+
+
+def users_at(stage, elapsed):
+    # Linear interpolation; constant for every stage type except ramp
+    progress = min(max(elapsed / stage["duration"], 0.0), 1.0) if stage["duration"] else 1.0
+    return round(stage["from"] + (stage["to"] - stage["from"]) * progress)
+
+
+class VuserPool:
+    """Long-lived virtual users that are activated and parked instead of being started and joined.
+
+    Every request chain of the scenario gets its own set of workers, as in Scenario.speed. A worker with
+    index >= the current target waits on a condition (keeping its session) until the pool grows
+    back, so stage transitions never pay thread start-up or connection set-up costs.
+    """
+
+    def __init__(self, scenario, requests):
+        self.scenario = scenario
+        self.requests = requests
+        self.target = 0
+        self.vusers = 0  # Total users across all generators, recorded with the results
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.workers = []
+
+    def resize(self, vusers):
+        users = self.scenario.local_users(vusers)
+        with self.condition:
+            self.target = users
+            self.vusers = vusers
+            self.condition.notify_all()
+        while len(self.workers) < users:
+            index = len(self.workers)
+            started = []
+            for chain in self.scenario.vuser_chains(self.requests):
+                worker = threading.Thread(target=self._work, args=(chain, index), daemon=True)
+                started.append(worker)
+                worker.start()
+            self.workers.append(started)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for started in self.workers:
+            for worker in started:
+                worker.join()
+        self.workers = []
+
+    def _work(self, chain, index):
+        session = self.scenario.create_session()
+        context = self.scenario.new_context()
+        wheel = get_timer_wheel()
+        wheel.sleep(self.scenario.start_delay())
+        last_used = time.perf_counter()
+        scheduled_from, iteration = time.perf_counter(), 0
+        try:
+            while True:
+                delay_ns = None
+                for request in chain:
+                    with self.condition:
+                        if index >= self.target and not self.stopped:
+                            timeout = self.scenario.keep_alive  # A parked vuser keeps its connections that long
+                            while index >= self.target and not self.stopped:
+                                self.condition.wait(timeout)
+                                if self.scenario.drop_idle_connections(session, last_used):
+                                    timeout = None
+                            scheduled_from, iteration = time.perf_counter(), 0  # Parked time is not lateness
+                        if self.stopped:
+                            return
+                    if delay_ns is None:
+                        if not self.scenario.feed(context):
+                            return  # Out of unique data rows
+                        delay_ns = self.scenario.iteration_delay(scheduled_from, iteration)
+                        iteration += 1
+                    self.scenario.drop_idle_connections(session, last_used)
+                    timing = self.scenario.execute(request, session, context)
+                    last_used = time.perf_counter()
+                    timing.delay_ns = delay_ns
+                    self.scenario.log_timing(self.vusers, request.url, timing, self.scenario.stage)
+                    wheel.sleep(self.scenario.think_seconds())
+                    if timing.error and self.scenario.on_error != "continue":
+                        if self.scenario.on_error == "stop":
+                            return  # The slot stays empty; the stage statistics show the lost load
+                        session, context = self.scenario.restart_vuser(session)
+                        break
+        finally:
+            if session is not None:
+                session.close()
+
+
+def run_profile(scenario, stages, requests, tick=0.1):
+    pool = VuserPool(scenario, requests)
+    previous = None
+    try:
+        for stage in stages:
+            scenario.stage = stage["id"]  # Before resizing, so rows of newly activated vusers get the new stage
+            pool.resize(users_at(stage, 0))
+            if previous is not None:
+                scenario.end_stage(previous)  # Rows are tagged with the new stage from here on
+            previous = stage["id"]
+            print(f"Stage {stage['id']}: {stage['type']} {stage['from']} -> {stage['to']} users "
+                  f"for {stage['duration']}s")
+            start = time.perf_counter()
+            while True:
+                elapsed = time.perf_counter() - start
+                pool.resize(users_at(stage, elapsed))
+                if elapsed >= stage["duration"]:
+                    break
+                time.sleep(min(tick, stage["duration"] - elapsed))
+    finally:
+        pool.stop()
+        if previous is not None:
+            scenario.end_stage(previous)
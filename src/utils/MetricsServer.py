@@ -0,0 +1,110 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the exported latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _labels(**labels):
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def render_metrics(stats, writer, window_seconds=10):
+    """Prometheus text exposition of the live aggregates of a run; nothing here touches the request path."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    if stats is not None:
+        totals = stats.url_totals()
+        metric("roadrunner_requests_total", "counter", "Requests completed, successful or not.",
+               [(_labels(url=url), histogram.count) for url, (histogram, _) in totals.items()])
+        metric("roadrunner_errors_total", "counter", "Failed requests by error class.",
+               [(_labels(url=url, error=error), count)
+                for url, (_, errors) in totals.items() for error, count in errors.items()])
+
+        # Buckets are read off the HDR histograms at scrape time, so their bounds cost nothing while recording
+        metric("roadrunner_response_time_seconds", "histogram", "Response time of completed requests.", [])
+        for url, (histogram, _) in totals.items():
+            for bound in BUCKETS:
+                lines.append(f"roadrunner_response_time_seconds_bucket{_labels(url=url, le=bound)} "
+                             f"{histogram.count_at_or_below(bound * 1000)}")
+            lines.append(f"roadrunner_response_time_seconds_bucket{_labels(url=url, le='+Inf')} {histogram.count}")
+            lines.append(f"roadrunner_response_time_seconds_sum{_labels(url=url)} {histogram.total_us / 1e6}")
+            lines.append(f"roadrunner_response_time_seconds_count{_labels(url=url)} {histogram.count}")
+
+        window, window_errors = stats.window(window_seconds)
+        metric("roadrunner_window_response_time_seconds", "gauge",
+               f"Response time percentiles of the last {window_seconds} seconds.",
+               [(_labels(quantile=quantile), window.percentile(quantile * 100) / 1000)
+                for quantile in WINDOW_QUANTILES])
+        metric("roadrunner_window_error_ratio", "gauge",
+               f"Share of failed requests in the last {window_seconds} seconds.",
+               [("", window_errors / window.count if window.count else 0.0)])
+        metric("roadrunner_vusers", "gauge", "Virtual users of the latest recorded request.", [("", stats.vusers)])
+        metric("roadrunner_stage_info", "gauge", "Stage of the latest recorded request.",
+               [(_labels(stage=stats.stage), 1)])
+
+    if writer is not None:
+        writer_stats = writer.stats()
+        metric("roadrunner_writer_queue_depth", "gauge", "Result rows waiting for the writer thread.",
+               [("", writer_stats["queue_depth"])])
+        metric("roadrunner_writer_rows_written_total", "counter", "Result rows written.",
+               [("", writer_stats["rows_written"])])
+        metric("roadrunner_writer_blocked_puts_total", "counter", "Result rows that waited for a full queue.",
+               [("", writer_stats["blocked_puts"])])
+        metric("roadrunner_writer_dropped_rows_total", "counter",
+               "Result rows dropped because the queue was full (async engine).",
+               [("", writer_stats["dropped_rows"])])
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves /metrics in the Prometheus text format from a daemon thread.
+
+    `source` returns the current (StatsAggregator, ResultWriter) pair, either may be None, so the
+    endpoint follows writers that are replaced between runs.
+    """
+
+    def __init__(self, source, port=9108, host="0.0.0.0", window_seconds=10):
+        self.source = source
+        self.port = port
+        self.host = host
+        self.window_seconds = window_seconds
+        self.server = None
+
+    def start(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_metrics(*metrics.source(), window_seconds=metrics.window_seconds).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would flood the test output
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Metrics available at http://{self.host}:{self.server.server_port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
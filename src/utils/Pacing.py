@@ -0,0 +1,148 @@
+import math
+import os
+import random
+import threading
+import time
+
+THINK_TIMES = ("constant", "uniform", "exponential", "lognormal")
+
+
+class ThinkTime:
+    """Pause of a virtual user after each request, drawn from a distribution (seconds).
+
+    Accepted specs: a number (constant), a dict {"type": "uniform", "min": 0.5, "max": 2},
+    {"type": "exponential", "mean": 1}, {"type": "lognormal", "mean": 1, "sigma": 0.5}, or the
+    same as a string: "uniform:0.5:2", "exponential:1", "lognormal:1:0.5", "constant:1".
+    """
+
+    def __init__(self, spec=0):
+        self.spec = spec
+        if isinstance(spec, str) and ":" not in spec:
+            spec = float(spec)
+        if isinstance(spec, (int, float)):
+            spec = {"type": "constant", "value": spec}
+        elif isinstance(spec, str):
+            kind, *values = spec.split(":")
+            names = {"constant": ("value",), "uniform": ("min", "max"), "exponential": ("mean",),
+                     "lognormal": ("mean", "sigma")}.get(kind, ())
+            spec = dict(zip(names, map(float, values)), type=kind)
+        self.kind = spec.get("type", "constant")
+        if self.kind not in THINK_TIMES:
+            raise ValueError(f"Unknown think time '{self.kind}', expected one of {THINK_TIMES}")
+        self.value = float(spec.get("value", 0))
+        self.low = float(spec.get("min", 0))
+        self.high = float(spec.get("max", self.low))
+        self.mean = float(spec.get("mean", 0))
+        self.sigma = float(spec.get("sigma", 0.5))
+        # lognormvariate takes the parameters of the underlying normal; chosen so the mean is `mean`
+        self.mu = math.log(self.mean) - self.sigma ** 2 / 2 if self.mean > 0 else 0.0
+
+    def sample(self):
+        if self.kind == "constant":
+            return self.value
+        if self.kind == "uniform":
+            return random.uniform(self.low, self.high)
+        if self.mean <= 0:
+            return 0.0
+        if self.kind == "exponential":
+            return random.expovariate(1 / self.mean)
+        return random.lognormvariate(self.mu, self.sigma)
+
+
+class TimerWheel:
+    """Hashed timer wheel shared by all vuser threads of a process.
+
+    Waiting threads block on an event instead of sleeping on their own. One wheel thread sleeps
+    until the earliest deadline of the next occupied slot and spins only the last `spin` seconds
+    before it, so thousands of vusers get sub-millisecond wake-ups without each of them spinning.
+    Timers more than one turn of the wheel away stay in their slot for the following turns.
+    """
+
+    def __init__(self, tick=0.001, slots=1024, spin=0.0005):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.spin = spin
+        self.origin = time.perf_counter()
+        self.current = -1  # Last tick whose timers have all fired
+        self.pending = 0
+        self.target = None  # Deadline the wheel thread is waiting for
+        self.condition = threading.Condition()
+        self.thread = None
+        self.local = threading.local()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.wait_until(time.perf_counter() + seconds)
+
+    def wait_until(self, deadline):
+        tick = int((deadline - self.origin) / self.tick)
+        event = getattr(self.local, "event", None)
+        if event is None:
+            event = self.local.event = threading.Event()
+        event.clear()
+        with self.condition:
+            if tick <= self.current:
+                return
+            self.slots[tick % len(self.slots)].append((deadline, tick, event))
+            self.pending += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="timer-wheel", daemon=True)
+                self.thread.start()
+            if self.target is None or deadline < self.target:
+                self.condition.notify()  # Only an earlier timer changes what the wheel thread waits for
+        event.wait()
+
+    def _next_deadline(self):
+        # Earliest deadline in the nearest occupied slot of this turn, else the end of the turn
+        turn_end = self.current + len(self.slots)
+        for tick in range(self.current + 1, turn_end + 1):
+            timers = [deadline for deadline, timer_tick, _ in self.slots[tick % len(self.slots)]
+                      if timer_tick <= turn_end]
+            if timers:
+                return min(timers)
+        return self.origin + turn_end * self.tick
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.pending:
+                        self.target = None
+                        self.condition.wait()
+                        continue
+                    self.target = self._next_deadline()
+                    remaining = self.target - time.perf_counter()
+                    if remaining <= self.spin:
+                        break
+                    self.condition.wait(remaining - self.spin)
+                deadline = self.target
+            while time.perf_counter() < deadline:
+                time.sleep(0)  # Spin, but hand over the GIL so the vusers woken just before keep running
+            with self.condition:
+                now = time.perf_counter()
+                now_tick = int((now - self.origin) / self.tick)
+                due = []
+                for tick in range(self.current + 1, min(now_tick, self.current + len(self.slots)) + 1):
+                    slot = self.slots[tick % len(self.slots)]
+                    if slot:
+                        due.extend(event for deadline, _, event in slot if deadline <= now)
+                        slot[:] = [timer for timer in slot if timer[0] > now]
+                self.current = now_tick - 1  # The slot of now_tick may still hold later timers
+                self.pending -= len(due)
+            for event in due:
+                event.set()
+
+
+_wheel = None
+_wheel_pid = None
+_wheel_lock = threading.Lock()
+
+
+def get_timer_wheel():
+    # One wheel per process: a forked worker does not inherit the parent's wheel thread
+    global _wheel, _wheel_pid
+    if _wheel is None or _wheel_pid != os.getpid():
+        with _wheel_lock:
+            if _wheel is None or _wheel_pid != os.getpid():
+                _wheel, _wheel_pid = TimerWheel(), os.getpid()
+    return _wheel
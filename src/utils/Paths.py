@@ -1,7 +1,23 @@
 import os
+import shutil
 
 def get_results_csv_file():
     current_dir = os.path.dirname(__file__)
     parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
     results_dir = os.path.join(parent_dir, 'results')
-    return os.path.join(results_dir, 'results.csv')
\ No newline at end of file
+    return os.path.join(results_dir, 'results.csv')
+
+def get_runs_dir():
+    # Catalog of finished runs, next to the results of the current one
+    return os.path.join(os.path.dirname(get_results_csv_file()), 'runs')
+
+def open_result_file(path, mode, **options):
+    # The run catalog hard-links finished results instead of copying them, so a linked file is made this
+    # path's own before it is written: recreated when truncated, copied once when appended to
+    if os.path.exists(path) and os.stat(path).st_nlink > 1:
+        if "a" in mode:
+            shutil.copy2(path, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        else:
+            os.remove(path)
+    return open(path, mode, **options)
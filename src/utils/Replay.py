@@ -0,0 +1,166 @@
+import json
+import re
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from src.utils.Request import Request
+
+_entries_start = re.compile(r'"entries"\s*:\s*\[')
+_separator = re.compile(r"[\s,]*")
+
+MAX_LABELS = 200  # Every label costs latency histograms per stage and rollup bucket
+OTHER_LABEL = "other"
+# Path segments that identify a resource rather than an endpoint: numbers, UUIDs, long hex tokens
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+                        r"|[0-9a-fA-F]{16,})$")
+
+
+def read_jsonl(path):
+    """Yields the records of a JSON Lines access log one line at a time."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_har(path, chunk_size=64 * 1024):
+    """Yields the entries of a HAR file without loading the whole file.
+
+    Only the "entries" array is decoded, one entry at a time with raw_decode on a buffer that is
+    refilled from the file; the buffer grows when an entry (e.g. with a large response body) does not
+    fit, so every entry is decoded a bounded number of times.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as file:
+        buffer = ""
+        while True:
+            match = _entries_start.search(buffer)
+            if match:
+                buffer, position = buffer[match.end():], 0
+                break
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            buffer = buffer[-64:] + chunk  # Enough overlap for the key split across two chunks
+
+        while True:
+            position = _separator.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                entry, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = file.read(max(chunk_size, len(buffer) - position))
+                if not chunk:
+                    return  # Truncated file, e.g. a capture that is still being written
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield entry
+
+
+def _timestamp(value):
+    # Epoch seconds (or milliseconds), numeric strings or ISO 8601 ("2024-05-01T12:00:00.123Z")
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    return value / 1000 if value > 1e11 else float(value)
+
+
+def _literal(value):
+    # Recorded values are sent as they are, never rendered as templates
+    if isinstance(value, str):
+        return value.replace("{", "{{").replace("}", "}}")
+    if isinstance(value, dict):
+        return {key: _literal(item) for key, item in value.items()}
+    return value
+
+
+def endpoint_label(url, patterns=()):
+    """URL without its query string, with resource ids in the path replaced: /users/12345 -> /users/:id.
+
+    `patterns` are (regex, replacement) pairs applied to the path first, for ids the defaults miss
+    (e.g. (r"/orders/[A-Z]{3}\d+", "/orders/:order")).
+    """
+    parts = urlsplit(url)
+    path = parts.path
+    for pattern, replacement in patterns:
+        path = re.sub(pattern, replacement, path)
+    path = "/".join(":id" if ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+    return f"{parts.scheme}://{parts.netloc}{path}"
+
+
+class Labeler:
+    """Result labels of replayed entries, at most `max_labels` distinct ones.
+
+    `label` is a function url -> label, or a list of (regex, replacement) patterns for
+    endpoint_label. Entries with a "name" keep it. Once `max_labels` labels have been seen, entries
+    with a new label are recorded under "other", so a log of unbounded distinct paths cannot grow
+    the per-label statistics without bound.
+    """
+
+    def __init__(self, label=None, max_labels=MAX_LABELS):
+        self.label = label if callable(label) else lambda url: endpoint_label(url, label or ())
+        self.max_labels = max_labels
+        self.seen = set()
+        self.folded = 0
+
+    def __call__(self, url, name=None):
+        label = name or self.label(url)
+        if label not in self.seen:
+            if len(self.seen) >= self.max_labels:
+                self.folded += 1
+                return OTHER_LABEL
+            self.seen.add(label)
+        return label
+
+
+def request_from_entry(entry, labeler=None):
+    """Converts a HAR entry or a JSONL record into (timestamp, Request, label).
+
+    JSONL records hold "timestamp" (or "time"), "method", "url" and optionally "headers", "body"
+    and "name". The label the results are recorded under is the name if given, else the URL
+    without its query string and with ids in the path normalised (see Labeler).
+    """
+    if "request" in entry:  # HAR
+        recorded = entry["request"]
+        timestamp = _timestamp(entry["startedDateTime"])
+        headers = {header["name"]: header["value"] for header in recorded.get("headers", [])
+                   if not header["name"].startswith(":")}  # HTTP/2 pseudo-headers are not real headers
+        body = recorded.get("postData", {}).get("text")
+        method, url, name = recorded["method"], recorded["url"], entry.get("comment")
+    else:
+        timestamp = _timestamp(entry.get("timestamp", entry.get("time", 0)))
+        headers = entry.get("headers") or {}
+        body = entry.get("body")
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        method, url, name = entry.get("method", "GET"), entry["url"], entry.get("name")
+
+    # Hop-by-hop and computed headers are left to the HTTP client
+    headers = {key: value for key, value in headers.items()
+               if key.lower() not in ("content-length", "host", "connection", "transfer-encoding")}
+    label = (labeler or Labeler())(url, name)
+    request = (Request(label).set_url(_literal(url)).set_method(method)
+               .set_headers(_literal(headers)).set_body(_literal(body)))
+    return timestamp, request, label
+
+
+def read_replay(path, response_policy="discard", label=None, max_labels=MAX_LABELS):
+    """Streams a recorded log as (seconds since the first entry, Request, label), in file order.
+
+    `label` and `max_labels` are passed to Labeler.
+    """
+    entries = read_har(path) if path.lower().endswith(".har") else read_jsonl(path)
+    labeler = Labeler(label, max_labels)
+    first = None
+    for entry in entries:
+        timestamp, request, label = request_from_entry(entry, labeler)
+        if first is None:
+            first = timestamp
+        yield timestamp - first, request.set_response_policy(response_policy), label
+    if labeler.folded:
+        print(f"Replay of {path}: {labeler.folded} entries beyond {max_labels} distinct labels "
+              f"recorded as '{OTHER_LABEL}'")
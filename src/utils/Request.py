@@ -1,9 +1,36 @@
+import asyncio
 import time
-import requests
-from requests.exceptions import ConnectionError, Timeout
+import zlib
+from requests.exceptions import ConnectionError, RequestException, Timeout
+
+from src.utils.Context import (HeaderExtractor, JsonPathExtractor, ReceivedResponse, RegexExtractor,
+                               apply_extractors, compile_template, extractor_from_dict, render_template)
+from src.utils.Timing import Timing, create_timed_session, start_timing
+
+CHUNK_SIZE = 64 * 1024
+
+
+def drain(chunks, checksum=False):
+    # Reads a body chunk by chunk without keeping or decoding it; returns (size, crc32 or None)
+    size, crc = 0, 0
+    for chunk in chunks:
+        size += len(chunk)
+        if checksum:
+            crc = zlib.crc32(chunk, crc)
+    return size, crc if checksum else None
+
+
+class RequestFailed(RequestException):
+    """A request that got no usable response; `timing` holds what was measured, status and error class."""
+
+    def __init__(self, message, timing):
+        super().__init__(message)
+        self.timing = timing
+
 
 class Request:
-    shared_variables = {}  # Shared variables dictionary
+    shared_variables = {}  # Initial values of every virtual user's context
+    response_policies = ("print", "discard", "size", "checksum", "sample")
 
     def __init__(self, name):
         self.name = name
@@ -11,9 +38,27 @@ class Request:
         self.method = None
         self.headers = {}
         self.body = None
+        self.extractors = []  # Run on every received response, saving values into the vuser context
+        self._templates = (None, None, None)  # Compiled url, headers and body
+        self.response_policy = "print"
+        self.sample_every = 100
+        self.responses_seen = 0
+
+    def to_dict(self):
+        return {"name": self.name, "url": self.url, "method": self.method, "headers": self.headers,
+                "body": self.body, "extractors": [extractor.to_dict() for extractor in self.extractors],
+                "response_policy": self.response_policy, "sample_every": self.sample_every}
+
+    @staticmethod
+    def from_dict(data):
+        request = Request(data["name"]).set_url(data["url"]).set_headers(data["headers"]).set_body(data["body"])
+        request.method = data["method"]
+        request.extractors = [extractor_from_dict(extractor) for extractor in data.get("extractors", [])]
+        return request.set_response_policy(data.get("response_policy", "print"), data.get("sample_every", 100))
 
     def set_url(self, url):
-        self.url = url
+        self.url = url  # The template itself labels the results, so every rendered URL counts as one endpoint
+        self._templates = (compile_template(url), self._templates[1], self._templates[2])
         return self
 
     def set_method(self, method):
@@ -22,41 +67,166 @@ class Request:
 
     def set_headers(self, headers):
         self.headers = headers
+        self._templates = (self._templates[0], compile_template(headers), self._templates[2])
         return self
 
     def set_body(self, body):
-        self.body = body.format(**Request.shared_variables)  # Use shared variables
+        # Rendered on every send with the vuser context, so values extracted earlier in the flow are used
+        self.body = body
+        self._templates = (self._templates[0], self._templates[1], compile_template(body))
+        return self
+
+    def save(self, key, path=None):
+        # Saves `key` of this request's JSON response (or the value at JSONPath `path`) into the vuser context
+        self.extractors.append(JsonPathExtractor(key, path or f"$['{key}']"))
+        return self
+
+    def save_regex(self, key, pattern, group=None):
+        self.extractors.append(RegexExtractor(key, pattern, group))
         return self
 
-    def save(self, key):
-        response = self.send_request()
-        Request.shared_variables[key] = response.json().get(key)  # Save to shared variables dictionary
+    def save_header(self, key, header):
+        self.extractors.append(HeaderExtractor(key, header))
         return self
 
-    def print_response(self, timeout=None):
+    def set_response_policy(self, policy, sample_every=100):
+        # print: decode and print every body (default); discard: drain the body without decoding it;
+        # size / checksum: drain it keeping only its size / CRC32 (timing.bytes, timing.checksum), both of the
+        # body as sent, since draining policies neither decompress nor decode it;
+        # sample: like print, but only for one response in `sample_every`
+        if policy not in Request.response_policies:
+            raise ValueError(f"Unknown response policy '{policy}', expected one of {Request.response_policies}")
+        self.response_policy = policy
+        self.sample_every = max(1, sample_every)
+        return self
+
+    def keeps_body(self):
+        # Extractors and printing need the body in memory, the other policies only drain it
+        return self.response_policy in ("print", "sample") or bool(self.extractors)
+
+    def should_print(self):
+        if self.response_policy == "print":
+            return True
+        if self.response_policy != "sample":
+            return False
+        self.responses_seen += 1  # Shared by the vusers; a lost update only shifts the sample
+        return (self.responses_seen - 1) % self.sample_every == 0
+
+    def render(self, context=None):
+        # URL, headers and body of one send; without a context the shared variables are used. A body that is
+        # set goes out whatever the method (PATCH, DELETE, or a recorded GET with a payload)
+        context = Request.shared_variables if context is None else context
+        url, headers, body = (render_template(template, context) for template in self._templates)
+        return url, headers or None, body or None
+
+    def print_response(self, timeout=None, session=None, context=None):
         if timeout is None or timeout <= 0:
             timeout = 10  # Set a default timeout if the provided value is invalid
-        response = self.send_request(timeout=timeout)
-        print(response.text)
+        response = self.send_request(timeout=timeout, session=session, context=context)
+        if self.should_print():
+            print(response.text)
         return response
 
-    def send_request(self, timeout=10, max_retries=5, backoff_factor=0.3):
+    async def print_response_async(self, session, timeout=None, context=None):
+        if timeout is None or timeout <= 0:
+            timeout = 10  # Set a default timeout if the provided value is invalid
+        received, timing = await self.send_request_async(session, timeout=timeout, context=context)
+        if self.should_print():
+            print(received.text())
+        return timing
+
+    async def send_request_async(self, session, timeout=10, max_retries=5, backoff_factor=0.3, context=None):
+        # Same contract as send_request, but on a shared aiohttp session; returns (ReceivedResponse, timing)
+        import aiohttp
+
         if timeout <= 0:
             timeout = 10  # Ensure timeout is greater than 0
+        url, headers, data = self.render(context)
         retries = 0
-        while retries < max_retries:
+        while True:
+            timing = Timing()
             try:
-                if self.method == "GET":
-                    response = requests.get(self.url, headers=self.headers, timeout=timeout)
-                elif self.method == "POST":
-                    response = requests.post(self.url, headers=self.headers, data=self.body, timeout=timeout)
-                elif self.method == "PUT":
-                    response = requests.put(self.url, headers=self.headers, data=self.body, timeout=timeout)
-                response.raise_for_status()  # Raise an exception for HTTP errors
-                return response
-            except (ConnectionError, Timeout) as e:
+                async with session.request(self.method, url, headers=headers, data=data,
+                                           timeout=aiohttp.ClientTimeout(total=timeout),
+                                           trace_request_ctx=timing, auto_decompress=self.keeps_body()) as response:
+                    timing.status = response.status
+                    timing.mark_headers()
+                    # Download the whole body within the measured time
+                    if self.keeps_body():
+                        body = await response.read()
+                        timing.mark_done(len(body))
+                    else:
+                        body, crc = b"", 0
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            timing.bytes += len(chunk)
+                            if self.response_policy == "checksum":
+                                crc = zlib.crc32(chunk, crc)
+                        timing.mark_done(timing.bytes)
+                        timing.checksum = crc if self.response_policy == "checksum" else None
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                    # get_encoding() needs the body, which the draining policies never read
+                    received = ReceivedResponse(body, response.headers,
+                                                response.get_encoding() if self.keeps_body() else None)
+                    if self.extractors:
+                        apply_extractors(self.extractors, received,
+                                         Request.shared_variables if context is None else context)
+                    return received, timing
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
                 retries += 1
+                if retries >= max_retries:
+                    # Same error classes as the threads engine, so runs of both engines compare
+                    timing.mark_failed(e, "Timeout" if isinstance(e, asyncio.TimeoutError) else "ConnectionError")
+                    raise RequestFailed(f"Failed to connect to {self.url} after {max_retries} retries", timing) from e
                 wait = backoff_factor * (2 ** retries)
                 print(f"Retrying in {wait} seconds...")
-                time.sleep(wait)
-        raise ConnectionError(f"Failed to connect to {self.url} after {max_retries} retries")
\ No newline at end of file
+                await asyncio.sleep(wait)
+            except aiohttp.ClientError as e:
+                # HTTP error status or a malformed response
+                timing.mark_failed(e, "HTTPError" if isinstance(e, aiohttp.ClientResponseError) else None)
+                raise RequestFailed(f"Request to {self.url} failed: {e}", timing) from e
+
+    def send_request(self, timeout=10, max_retries=5, backoff_factor=0.3, session=None, context=None):
+        # Without a session every call opens (and closes) its own connection
+        if timeout <= 0:
+            timeout = 10  # Ensure timeout is greater than 0
+        client = session if session is not None else create_timed_session()
+        url, headers, data = self.render(context)
+        retries = 0
+        try:
+            while True:
+                timing = start_timing()
+                try:
+                    response = client.request(self.method, url, headers=headers, data=data,
+                                              timeout=timeout, stream=True)
+                    timing.status = response.status_code
+                    timing.mark_headers()
+                    # Download the whole body within the measured time
+                    if self.keeps_body():
+                        timing.mark_done(len(response.content))
+                    else:
+                        # Raw stream: iter_content would decompress a gzip/deflate body only to drop it
+                        size, timing.checksum = drain(response.raw.stream(CHUNK_SIZE, decode_content=False),
+                                                      self.response_policy == "checksum")
+                        timing.mark_done(size)
+                    response.timing = timing
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                    if self.extractors:
+                        apply_extractors(self.extractors,
+                                         ReceivedResponse(response.content, response.headers, response.encoding),
+                                         Request.shared_variables if context is None else context)
+                    return response
+                except (ConnectionError, Timeout) as e:
+                    retries += 1
+                    if retries >= max_retries:
+                        timing.mark_failed(e, "Timeout" if isinstance(e, Timeout) else "ConnectionError")
+                        raise RequestFailed(f"Failed to connect to {self.url} after {max_retries} retries",
+                                            timing) from e
+                    wait = backoff_factor * (2 ** retries)
+                    print(f"Retrying in {wait} seconds...")
+                    time.sleep(wait)
+                except RequestException as e:
+                    timing.mark_failed(e)  # HTTP error status or a malformed response
+                    raise RequestFailed(f"Request to {self.url} failed: {e}", timing) from e
+        finally:
+            if session is None:
+                client.close()
\ No newline at end of file
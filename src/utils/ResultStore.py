@@ -0,0 +1,423 @@
+import datetime
+import io
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.utils.Paths import open_result_file
+from src.utils.ResultWriter import CSV_HEADER
+
+RESULT_DTYPE = np.dtype([
+    ("start_ns", "<i8"),  # Epoch nanoseconds
+    ("end_ns", "<i8"),
+    ("vusers", "<i4"),
+    ("url", "<i4"),  # Code into the "url" category list
+    ("response_ms", "<f4"),  # Total: connection set-up, time to first byte and body download
+    ("stage", "<i4"),  # Code into the "stage" category list
+    ("dns_ms", "<f4"),
+    ("connect_ms", "<f4"),
+    ("tls_ms", "<f4"),
+    ("ttfb_ms", "<f4"),
+    ("download_ms", "<f4"),
+    ("corrected_ms", "<f4"),  # Latency from the intended start (coordinated-omission corrected)
+    ("status", "<i2"),  # HTTP status, 0 when no response was received
+    ("bytes", "<i8"),
+    ("error", "<i4"),  # Code into the "error" category list ("" for a successful request)
+])
+
+# Optional record fields and the results.csv columns they are exposed as
+TIMING_COLUMNS = {
+    "dns_ms": "DnsTime[ms]",
+    "connect_ms": "ConnectTime[ms]",
+    "tls_ms": "TlsTime[ms]",
+    "ttfb_ms": "TtfbTime[ms]",
+    "download_ms": "DownloadTime[ms]",
+    "corrected_ms": "CorrectedResponseTime[ms]",
+    "status": "StatusCode",
+    "bytes": "Bytes",
+}
+
+# Numeric record fields by the results.csv column they are exposed as, for reads that skip the DataFrame
+NUMERIC_COLUMNS = {"VusersNumber": "vusers", "ResponseTime[ms]": "response_ms",
+                   **{column: name for name, column in TIMING_COLUMNS.items()}}
+
+# Upper bounds of the latency buckets every rollup record counts its requests into: a quarter power of two
+# apart (19%), from 0.1 ms up to the histograms' one hour. Intervals merge exactly by adding their counts
+ROLLUP_BUCKET_BOUNDS_MS = 0.1 * 2 ** (np.arange(102) / 4)
+
+# Per-interval aggregates written during the run by RollupSink, one store per interval length
+ROLLUP_DTYPE = np.dtype([
+    ("start_s", "<i8"),  # Epoch seconds at the start of the interval
+    ("url", "<i4"),
+    ("stage", "<i4"),
+    ("count", "<i4"),
+    ("mean_ms", "<f4"),
+    ("min_ms", "<f4"),
+    ("max_ms", "<f4"),
+    ("p50_ms", "<f4"),
+    ("p95_ms", "<f4"),
+    ("p99_ms", "<f4"),
+    ("errors", "<i4"),
+    ("vusers", "<i4"),  # Most vusers active in the interval
+    ("corrected_mean_ms", "<f4"),  # Latency from the intended start (coordinated-omission corrected)
+    ("corrected_p50_ms", "<f4"),
+    ("corrected_p95_ms", "<f4"),
+    ("corrected_p99_ms", "<f4"),
+    ("buckets", "<i4", (len(ROLLUP_BUCKET_BOUNDS_MS),)),  # Requests per ROLLUP_BUCKET_BOUNDS_MS bucket
+    ("corrected_buckets", "<i4", (len(ROLLUP_BUCKET_BOUNDS_MS),)),
+])
+ROLLUP_LEVELS = (1, 10, 60)  # Interval lengths in seconds
+
+RECORDS_FILE = "records.bin"
+SCHEMA_FILE = "schema.json"
+
+
+def get_store_dir(csv_file):
+    # The columnar store lives next to the CSV it replaces: results/results.csv -> results/results_store
+    return os.path.join(os.path.dirname(os.path.abspath(csv_file)), "results_store")
+
+
+def get_rollup_dir(store_dir, level):
+    return os.path.join(store_dir, f"rollup_{level}s")
+
+
+class ResultStore:
+    """Columnar results store: fixed-width binary records plus dictionaries for categorical columns.
+
+    `records.bin` is a flat array of `dtype` records that readers memory-map without parsing or
+    copying; `schema.json` holds the record layout and the category values (e.g. URLs).
+    """
+
+    def __init__(self, path, dtype=RESULT_DTYPE, categorical=("url", "stage", "error")):
+        self.path = path
+        self.dtype = dtype
+        self.categories = {name: [] for name in categorical}
+        self.codes = {name: {} for name in categorical}
+        self.file = None
+        if os.path.exists(self._schema_path()):
+            self._load_schema()
+
+    def _records_path(self):
+        return os.path.join(self.path, RECORDS_FILE)
+
+    def _schema_path(self):
+        return os.path.join(self.path, SCHEMA_FILE)
+
+    def _load_schema(self):
+        with open(self._schema_path()) as file:
+            schema = json.load(file)
+        self.dtype = np.dtype([tuple(field) for field in schema["fields"]])
+        self.categories = schema["categories"]
+        self.codes = {name: {value: code for code, value in enumerate(values)}
+                      for name, values in self.categories.items()}
+
+    def _save_schema(self):
+        schema = {"fields": self.dtype.descr, "categories": self.categories}
+        tmp_path = self._schema_path() + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(schema, file)
+        os.replace(tmp_path, self._schema_path())  # Readers never see a half-written schema
+
+    def exists(self):
+        return os.path.exists(self._schema_path())
+
+    def reset(self):
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.categories = {name: [] for name in self.categories}
+        self.codes = {name: {} for name in self.categories}
+
+    def encode(self, name, value):
+        codes = self.codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[name])
+            self.categories[name].append(value)
+            self._save_schema()
+        return code
+
+    def write(self, rows):
+        # ResultWriter sink interface
+        if self.file is None:
+            os.makedirs(self.path, exist_ok=True)
+            if not self.exists():
+                self._save_schema()
+            self.file = open_result_file(self._records_path(), "ab")
+        records = np.empty(len(rows), dtype=self.dtype)
+        for name in self.dtype.names:
+            if name in self.codes:
+                records[name] = [self.encode(name, row[name]) for row in rows]
+            else:
+                records[name] = [row.get(name, 0) for row in rows]
+        self.file.write(records.tobytes())
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def records(self):
+        """Memory-mapped, read-only view of all complete records."""
+        self._load_schema()
+        path = self._records_path()
+        count = os.path.getsize(path) // self.dtype.itemsize if os.path.exists(path) else 0
+        if count == 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode="r", shape=(count,))
+
+    def to_dataframe(self, records=None):
+        """Results in the legacy results.csv column layout, with local naive timestamps.
+
+        `records` defaults to all records; a slice of them gives the frame of just those rows.
+        """
+        records = self.records() if records is None else records
+        df = pd.DataFrame({
+            "VusersNumber": records["vusers"],
+            "URL": pd.Categorical.from_codes(records["url"], categories=self.categories["url"]),
+            "StartTime": _local_times(records["start_ns"]),
+            "EndTime": _local_times(records["end_ns"]),
+            "ResponseTime[ms]": records["response_ms"],
+        })
+        # Fields below are absent in stores written by older versions
+        if "stage" in records.dtype.names:
+            df["Stage"] = pd.Categorical.from_codes(records["stage"], categories=self.categories["stage"])
+        for name, column in TIMING_COLUMNS.items():
+            if name in records.dtype.names:
+                df[column] = records[name]
+        if "error" in records.dtype.names:
+            df["Error"] = pd.Categorical.from_codes(records["error"], categories=self.categories["error"])
+        return df
+
+    def export_csv(self, csv_file):
+        records = self.records()
+        df = self.to_dataframe()
+        for column in ("StartTime", "EndTime"):
+            df[column] = df[column].dt.strftime('%H:%M:%S:%f').str[:-3]
+        df["StartEpochNs"] = records["start_ns"]
+        df["EndEpochNs"] = records["end_ns"]
+        with open_result_file(csv_file, "w", newline="") as file:
+            df[[column for column in CSV_HEADER if column in df.columns]].to_csv(file, index=False)
+
+
+def _local_times(epochs, unit="ns"):
+    """Naive local wall-clock times of epoch values, each with the UTC offset in force at that instant.
+
+    Runs that cross a DST change, or are viewed after one, are not shifted by an hour. Offsets only
+    change on quarter-hour boundaries, so the system time zone is asked once per quarter hour
+    present instead of once per row (a tz_convert to the local zone takes minutes on millions of rows).
+    """
+    epochs_ns = np.asarray(epochs, dtype=np.int64) * (10 ** 9 if unit == "s" else 1)
+    quarters, inverse = np.unique(epochs_ns // (900 * 10 ** 9), return_inverse=True)
+    offsets = np.array([datetime.datetime.fromtimestamp(quarter * 900, datetime.timezone.utc).astimezone()
+                        .utcoffset().total_seconds() for quarter in quarters.tolist()], dtype=np.int64)
+    return pd.to_datetime(epochs_ns + offsets[inverse.reshape(-1)] * 10 ** 9, unit="ns")
+
+
+def results_available(csv_file):
+    store = ResultStore(get_store_dir(csv_file))
+    if store.exists():
+        return True
+    return os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+
+
+def _parse_times(data):
+    if 'StartEpochNs' in data.columns:
+        # Absolute timestamps keep their date, so runs crossing midnight stay ordered
+        data['StartTime'] = _local_times(data['StartEpochNs'])
+        data['EndTime'] = _local_times(data['EndEpochNs'])
+    else:
+        data['StartTime'] = pd.to_datetime(data['StartTime'], format='%H:%M:%S:%f')
+        data['EndTime'] = pd.to_datetime(data['EndTime'], format='%H:%M:%S:%f')
+    return data
+
+
+class ResultCache:
+    """Parsed results of one run, kept between loads and extended with the rows appended since.
+
+    The frame is reused while its source (the columnar store, else results.csv) keeps its identity
+    (device, inode) and only grows: an unchanged file costs a stat, a grown one the parse of the new
+    records or complete CSV lines alone. A replaced or truncated file, as at the start of a new run,
+    is loaded from scratch.
+    """
+
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self.source = None  # ("store" or "csv", device, inode) of the loaded file
+        self.offset = 0  # Bytes of the source already in the frame
+        self.columns = None  # Header of the CSV source
+        self.frame = None
+        self.lock = threading.Lock()  # Dash serves callbacks from several threads
+
+    def load(self):
+        with self.lock:
+            store = ResultStore(get_store_dir(self.csv_file))
+            if store.exists():
+                self._load_store(store)
+            else:
+                self._load_csv()
+            # Callers add their own columns; a shallow copy keeps those out of the cache
+            return self.frame.copy(deep=False)
+
+    def _reset(self, source):
+        self.source, self.offset, self.columns, self.frame = source, 0, None, None
+
+    def _load_store(self, store):
+        path = store._records_path()
+        stat = os.stat(path if os.path.exists(path) else store._schema_path())
+        source = ("store", stat.st_dev, stat.st_ino)
+        if source != self.source or stat.st_size < self.offset:
+            self._reset(source)
+        if self.frame is not None and stat.st_size - self.offset < store.dtype.itemsize:
+            return
+
+        records = store.records()
+        tail = store.to_dataframe(records[self.offset // store.dtype.itemsize:])
+        if self.frame is None:
+            self.frame = tail
+        else:
+            # Categories only ever grow, so the cached codes stay valid under the longer category lists
+            for column in ("URL", "Stage", "Error"):
+                if column in tail.columns:
+                    self.frame[column] = self.frame[column].cat.set_categories(tail[column].cat.categories)
+            self.frame = pd.concat([self.frame, tail], ignore_index=True)
+        self.offset = len(records) * store.dtype.itemsize
+
+    def _load_csv(self):
+        stat = os.stat(self.csv_file)
+        source = ("csv", stat.st_dev, stat.st_ino)
+        if source != self.source or stat.st_size < self.offset:
+            self._reset(source)
+        if self.frame is not None and stat.st_size == self.offset:
+            return
+
+        with open(self.csv_file, "rb") as file:
+            file.seek(self.offset)
+            chunk = file.read(stat.st_size - self.offset)
+        end = chunk.rfind(b"\n") + 1  # A row still being written is parsed on the next load
+        start = 0
+        if self.columns is None and end:
+            start = chunk.find(b"\n") + 1
+            self.columns = chunk[:start].decode("utf-8").strip().split(",")
+        columns = self.columns or CSV_HEADER
+        if end > start:
+            tail = _parse_times(pd.read_csv(io.BytesIO(chunk[start:end]), header=None, names=columns))
+            if self.frame is not None and not self.frame.empty:
+                tail = pd.concat([self.frame, tail], ignore_index=True)
+            self.frame = tail
+        elif self.frame is None:
+            self.frame = pd.DataFrame(columns=columns)
+        self.offset += end
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def load_rollups(csv_file, level=10):
+    """Aggregates of `level`-second intervals in the results layout, one row per interval, URL and stage.
+
+    StartTime and EndTime bound the interval, ResponseTime[ms] is its mean; Count, Errors, Min[ms],
+    Max[ms], P50[ms], P95[ms] and P99[ms] describe it further, CorrectedResponseTime[ms] and
+    CorrectedP50/95/99[ms] do the same for the corrected latency. Buckets and CorrectedBuckets hold the
+    interval's latency bucket counts, which merge_rollups adds up to combine intervals.
+    """
+    store = ResultStore(get_rollup_dir(get_store_dir(csv_file), level), ROLLUP_DTYPE, ("url", "stage"))
+    if not store.exists():
+        raise FileNotFoundError(f"No {level} s rollups next to {csv_file}, levels are {ROLLUP_LEVELS}")
+    records = store.records()
+    start = _local_times(records["start_s"], unit="s")
+    data = pd.DataFrame({
+        "VusersNumber": records["vusers"],
+        "URL": pd.Categorical.from_codes(records["url"], categories=store.categories["url"]),
+        "StartTime": start,
+        "EndTime": start + pd.Timedelta(seconds=level),
+        "ResponseTime[ms]": records["mean_ms"],
+        "Stage": pd.Categorical.from_codes(records["stage"], categories=store.categories["stage"]),
+        "Count": records["count"],
+        "Errors": records["errors"],
+        "Min[ms]": records["min_ms"],
+        "Max[ms]": records["max_ms"],
+        "P50[ms]": records["p50_ms"],
+        "P95[ms]": records["p95_ms"],
+        "P99[ms]": records["p99_ms"],
+    })
+    # Fields below are absent in rollups written by older versions
+    for name, column in (("corrected_mean_ms", "CorrectedResponseTime[ms]"), ("corrected_p50_ms", "CorrectedP50[ms]"),
+                         ("corrected_p95_ms", "CorrectedP95[ms]"), ("corrected_p99_ms", "CorrectedP99[ms]")):
+        if name in records.dtype.names:
+            data[column] = records[name]
+    for name, column in (("buckets", "Buckets"), ("corrected_buckets", "CorrectedBuckets")):
+        if name in records.dtype.names:
+            data[column] = list(np.array(records[name]))  # One count array per interval
+    return data
+
+
+def _bucket_percentile(counts, percentile):
+    # Upper bound of the bucket holding the rank, so at most one bucket width above the exact value
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    rank = max(1, -(-total * percentile // 100))
+    return float(ROLLUP_BUCKET_BOUNDS_MS[np.searchsorted(np.cumsum(counts), rank)])
+
+
+def merge_rollups(data, by="VusersNumber", percentiles=(50, 95, 99)):
+    """Rollup intervals combined per value of `by`: Count, Errors, Max[ms], ResponseTime[ms] and the
+    P<percentile>[ms] columns, plus their Corrected counterparts when the rollups have them.
+
+    Means are weighted by request count. Percentiles come from the summed latency buckets, so they are
+    within one bucket width (19%) of the exact value, and never above the merged maximum; rollups of
+    older versions have no buckets, and their count-weighted mean of the interval percentiles is only
+    an approximation.
+    """
+    grouped = data.groupby(by, observed=True)
+    counts = grouped["Count"].sum()
+    merged = pd.DataFrame({"Count": counts, "Errors": grouped["Errors"].sum(), "Max[ms]": grouped["Max[ms]"].max()})
+    for prefix in ("", "Corrected"):
+        if f"{prefix}ResponseTime[ms]" not in data.columns:
+            continue
+        mean = f"{prefix}ResponseTime[ms]"
+        merged[mean] = (data[mean] * data["Count"]).groupby(data[by], observed=True).sum() / counts
+        buckets = f"{prefix}Buckets"
+        for percentile in percentiles:
+            column = f"{prefix}P{percentile}[ms]"
+            if buckets in data.columns:
+                values = grouped[buckets].agg(lambda rows: _bucket_percentile(np.sum(list(rows), axis=0), percentile))
+                merged[column] = values.astype(float) if prefix else np.minimum(values.astype(float), merged["Max[ms]"])
+            else:
+                merged[column] = (data[column] * data["Count"]).groupby(data[by], observed=True).sum() / counts
+    return merged
+
+
+def load_results(csv_file, rollup=None):
+    """Loads test results, preferring the columnar store and falling back to results.csv.
+
+    Parsed results are cached per file and only rows appended since the previous call are parsed,
+    so dashboards and monitors can reload a growing run cheaply. With `rollup` (seconds, one of
+    ROLLUP_LEVELS) the per-interval aggregates are loaded instead of the raw rows.
+    """
+    if rollup:
+        return load_rollups(csv_file, rollup)
+    with _caches_lock:
+        cache = _caches.setdefault(os.path.abspath(csv_file), ResultCache(csv_file))
+    return cache.load()
+
+
+def load_result_arrays(csv_file, columns=("VusersNumber", "ResponseTime[ms]"), rollup=None):
+    """Typed numpy arrays of the given result columns, for models that need no DataFrame.
+
+    Numeric columns of the columnar store are copied straight out of the memory-mapped records;
+    results.csv, rollups and the other columns go through load_results.
+    """
+    store = ResultStore(get_store_dir(csv_file))
+    if not rollup and store.exists():
+        records = store.records()
+        if all(NUMERIC_COLUMNS.get(column) in records.dtype.names for column in columns):
+            return {column: np.array(records[NUMERIC_COLUMNS[column]]) for column in columns}
+    data = load_results(csv_file, rollup)
+    return {column: data[column].to_numpy() for column in columns}
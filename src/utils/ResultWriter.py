@@ -0,0 +1,160 @@
+import csv
+import datetime
+import queue
+import threading
+import time
+
+from src.utils.Paths import open_result_file
+
+CSV_HEADER = ["VusersNumber", "URL", "StartTime", "EndTime", "ResponseTime[ms]", "Stage",
+              "StartEpochNs", "EndEpochNs", "DnsTime[ms]", "ConnectTime[ms]", "TlsTime[ms]", "TtfbTime[ms]",
+              "DownloadTime[ms]", "CorrectedResponseTime[ms]", "StatusCode", "Bytes", "Error"]
+
+
+def format_time(epoch_ns):
+    # Legacy results.csv time format: local wall clock, milliseconds, no date
+    return datetime.datetime.fromtimestamp(epoch_ns / 1e9).strftime('%H:%M:%S:%f')[:-3]
+
+
+class CsvResultSink:
+    """Appends result rows to results.csv, keeping the file open between batches."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.writer = None
+
+    def write(self, rows):
+        if self.file is None:
+            self.file = open_result_file(self.path, mode='a', newline='')
+            self.writer = csv.writer(self.file)
+        self.writer.writerows(
+            [row['vusers'], row['url'], format_time(row['start_ns']), format_time(row['end_ns']),
+             row['response_ms'], row['stage'], row['start_ns'], row['end_ns'], row['dns_ms'], row['connect_ms'],
+             row['tls_ms'], row['ttfb_ms'], row['download_ms'], row.get('corrected_ms', row['response_ms']),
+             row.get('status', 0), row.get('bytes', 0), row.get('error', '')]
+            for row in rows)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class QueueResultSink:
+    """Forwards whole batches to another process, used by Scenario worker processes."""
+
+    def __init__(self, target_queue):
+        self.target_queue = target_queue
+
+    def write(self, rows):
+        self.target_queue.put(rows)
+
+    def close(self):
+        pass
+
+
+class ResultWriter:
+    """Background thread that drains a bounded queue of result rows and writes them in batches.
+
+    Virtual users only enqueue rows. When the queue is full `put` blocks (backpressure) and the
+    wait is counted, so a writer that cannot keep up shows in `stats()` instead of in latencies.
+    Callers that must never block, such as coroutines on the async engine's event loop, pass
+    block=False; their rows are then dropped while the queue is full and counted as dropped_rows.
+    """
+
+    def __init__(self, sinks, batch_size=1000, flush_interval=0.5, max_queue=100000):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.rows_written = 0
+        self.batches_written = 0
+        self.blocked_puts = 0
+        self.blocked_seconds = 0.0
+        self.dropped_rows = 0
+        self.max_depth = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def put(self, row, block=True):
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            if not block:
+                self.dropped_rows += 1
+                return False
+            blocked_at = time.perf_counter()
+            self.queue.put(row)
+            self.blocked_puts += 1
+            self.blocked_seconds += time.perf_counter() - blocked_at
+        return True
+
+    def put_many(self, rows):
+        for row in rows:
+            self.put(row)
+
+    def flush(self):
+        # Blocks until every row queued before this call has been written
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        for sink in self.sinks:
+            sink.close()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "blocked_puts": self.blocked_puts,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "dropped_rows": self.dropped_rows,
+        }
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = False  # Time threshold reached
+
+            if isinstance(item, dict):
+                batch.append(item)
+                self.max_depth = max(self.max_depth, self.queue.qsize())
+                if len(batch) < self.batch_size:
+                    continue
+
+            self._write(batch)
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e:
+                print(f"Error writing results: {e}")
+        self.rows_written += len(batch)
+        self.batches_written += 1
@@ -0,0 +1,75 @@
+from src.utils.Histogram import LatencyHistogram
+from src.utils.ResultStore import ROLLUP_BUCKET_BOUNDS_MS, ROLLUP_DTYPE, ROLLUP_LEVELS, ResultStore, get_rollup_dir
+
+
+class RollupSink:
+    """ResultWriter sink that maintains fixed-interval aggregates while the run is written.
+
+    Rows are counted into buckets of the shortest level by completion second, URL and stage. A
+    bucket is written once rows `grace` seconds past its end have arrived, then merged into its
+    bucket of the next level, which is written and merged the same way; each level costs one
+    histogram merge per bucket, not work per row. Rows that arrive after their bucket was written
+    form an extra record for the same interval. Every level is a ResultStore next to the raw one.
+    Records keep their latency bucket counts too, measured and corrected, so readers can merge
+    intervals into exact counts (merge_rollups) rather than averaging their percentiles.
+    """
+
+    def __init__(self, store_dir, levels=ROLLUP_LEVELS, grace=5):
+        self.levels = levels
+        self.grace = grace
+        self.stores = [ResultStore(get_rollup_dir(store_dir, level), ROLLUP_DTYPE, ("url", "stage"))
+                       for level in levels]
+        # (start second, url, stage) -> [histogram, corrected histogram, errors, vusers]
+        self.buckets = [{} for _ in levels]
+        self.watermark = 0  # Latest completion second seen
+
+    def write(self, rows):
+        size, buckets = self.levels[0], self.buckets[0]
+        for row in rows:
+            second = row["end_ns"] // 1_000_000_000
+            key = (second - second % size, row["url"], row["stage"])
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [LatencyHistogram(), LatencyHistogram(), 0, 0]
+            bucket[0].record(row["response_ms"])
+            bucket[1].record(row.get("corrected_ms", row["response_ms"]))
+            bucket[2] += 1 if row.get("error") else 0
+            bucket[3] = max(bucket[3], row["vusers"])
+            self.watermark = max(self.watermark, second)
+        self._write_done(self.watermark - self.grace)
+
+    def close(self):
+        self._write_done(None)
+        for store in self.stores:
+            store.close()
+
+    def _write_done(self, watermark):
+        # Writes the buckets that ended before `watermark` (all of them with None), shortest level first
+        for level, size in enumerate(self.levels):
+            buckets = self.buckets[level]
+            done = sorted(key for key in buckets if watermark is None or key[0] + size <= watermark)
+            if not done:
+                continue
+            records = []
+            for key in done:
+                histogram, corrected, errors, vusers = buckets.pop(key)
+                start, url, stage = key
+                records.append({"start_s": start, "url": url, "stage": stage, "count": histogram.count,
+                                "mean_ms": histogram.mean(), "min_ms": histogram.minimum(),
+                                "max_ms": histogram.maximum(), "p50_ms": histogram.percentile(50),
+                                "p95_ms": histogram.percentile(95), "p99_ms": histogram.percentile(99),
+                                "errors": errors, "vusers": vusers,
+                                "corrected_mean_ms": corrected.mean(), "corrected_p50_ms": corrected.percentile(50),
+                                "corrected_p95_ms": corrected.percentile(95),
+                                "corrected_p99_ms": corrected.percentile(99),
+                                "buckets": histogram.regroup(ROLLUP_BUCKET_BOUNDS_MS),
+                                "corrected_buckets": corrected.regroup(ROLLUP_BUCKET_BOUNDS_MS)})
+                if level + 1 < len(self.levels):
+                    next_size = self.levels[level + 1]
+                    parent = self.buckets[level + 1].setdefault((start - start % next_size, url, stage),
+                                                                [LatencyHistogram(), LatencyHistogram(), 0, 0])
+                    parent[0].merge(histogram)
+                    parent[1].merge(corrected)
+                    parent[2] += errors
+                    parent[3] = max(parent[3], vusers)
+            self.stores[level].write(records)
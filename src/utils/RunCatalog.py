@@ -0,0 +1,178 @@
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src.utils.Paths import get_runs_dir
+from src.utils.ResultStore import ResultStore, get_store_dir, load_results, merge_rollups
+
+INDEX_FILE = "index.jsonl"
+META_FILE = "meta.json"
+RESULTS_CSV = "results.csv"
+STAGE_STATS_CSV = "stage_stats.csv"
+
+
+def git_sha():
+    # The image has no .git directory, so a build can pass the commit in GIT_SHA instead
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=5)
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return os.environ.get("GIT_SHA")
+
+
+def link_or_copy(source, target):
+    # Archives a finished result file without copying its data; writers break the link before changing the
+    # file (open_result_file). Falls back to a copy where hard links are unavailable, e.g. across devices
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def vuser_summary(data):
+    """Count, mean, p50/p95/p99, corrected p99 and error rate per vuser count, from raw results or rollups."""
+    grouped = data.groupby("VusersNumber", observed=True)
+    if "P99[ms]" in data.columns:
+        # Rollup intervals are merged through their latency buckets
+        merged = merge_rollups(data)
+        summary = merged[[column for column in ("Count", "ResponseTime[ms]", "P50[ms]", "P95[ms]", "P99[ms]",
+                                                "CorrectedP99[ms]") if column in merged.columns]].copy()
+        summary["ErrorRate"] = merged["Errors"] / merged["Count"]
+    else:
+        summary = pd.DataFrame({"Count": grouped.size(), "ResponseTime[ms]": grouped["ResponseTime[ms]"].mean()})
+        for percentile in (50, 95, 99):
+            summary[f"P{percentile}[ms]"] = grouped["ResponseTime[ms]"].quantile(percentile / 100)
+        if "CorrectedResponseTime[ms]" in data.columns:
+            summary["CorrectedP99[ms]"] = grouped["CorrectedResponseTime[ms]"].quantile(0.99)
+        errors = ((data["Error"].fillna("").astype(str) != "") if "Error" in data.columns
+                  else pd.Series(False, data.index))
+        summary["ErrorRate"] = errors.groupby(data["VusersNumber"]).mean()
+    return summary.rename(columns={"ResponseTime[ms]": "Mean[ms]"}).reset_index()
+
+
+class RunCatalog:
+    """Catalog of finished test runs under results/runs.
+
+    Every run gets a directory <id>/ with its columnar store (and rollups), stage statistics,
+    optional results.csv and meta.json: git commit, profile, targets, scenario settings and a
+    summary. index.jsonl lists the runs, one JSON line per event (start, finish); listing reads
+    only the index, and a run's data is read only when it is loaded or compared.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_runs_dir()
+
+    def _index_path(self):
+        return os.path.join(self.path, INDEX_FILE)
+
+    def run_dir(self, run_id):
+        return os.path.join(self.path, run_id)
+
+    def _append_index(self, entry):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._index_path(), "a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def start_run(self, label=None, profile=None, targets=(), settings=None, argv=()):
+        """Registers a starting run and returns its id."""
+        now = datetime.datetime.now()
+        run_id = f"{now.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        meta = {"id": run_id, "label": label, "status": "running", "started": now.isoformat(timespec="seconds"),
+                "git_sha": git_sha(), "profile": profile, "targets": list(targets), "settings": settings or {},
+                "argv": list(argv)}
+        os.makedirs(self.run_dir(run_id))
+        self._write_meta(run_id, meta)
+        self._append_index(meta)
+        return run_id
+
+    def finish_run(self, run_id, results_file, stage_stats_file=None, status="complete", copy_csv=True):
+        """Hard-links the finished run's results into its directory and records its summary.
+
+        `copy_csv` is False when the run wrote no results.csv export, so a file left from an earlier
+        run is not archived as this one's.
+        """
+        run_dir = self.run_dir(run_id)
+        store_dir = get_store_dir(results_file)
+        if os.path.exists(store_dir):
+            shutil.copytree(store_dir, get_store_dir(os.path.join(run_dir, RESULTS_CSV)), dirs_exist_ok=True,
+                            copy_function=link_or_copy)
+        sources = ((results_file if copy_csv else None, RESULTS_CSV), (stage_stats_file, STAGE_STATS_CSV))
+        for source, name in sources:
+            if source and os.path.exists(source):
+                link_or_copy(source, os.path.join(run_dir, name))
+
+        meta = self.get(run_id)
+        meta.update(status=status, finished=datetime.datetime.now().isoformat(timespec="seconds"),
+                    summary=self._summary(run_dir))
+        self._write_meta(run_id, meta)
+        self._append_index({key: meta[key] for key in ("id", "status", "finished", "summary")})
+        return meta
+
+    def _write_meta(self, run_id, meta):
+        with open(os.path.join(self.run_dir(run_id), META_FILE), "w") as file:
+            json.dump(meta, file, indent=2)
+
+    def _summary(self, run_dir):
+        store = ResultStore(get_store_dir(os.path.join(run_dir, RESULTS_CSV)))
+        if not store.exists():
+            return {"requests": 0}
+        records = store.records()
+        if not len(records):
+            return {"requests": 0}
+        failed = [code for code, error in enumerate(store.categories.get("error", [])) if error]
+        return {"requests": int(len(records)),
+                "errors": int(np.isin(records["error"], failed).sum()) if "error" in records.dtype.names else 0,
+                "max_vusers": int(records["vusers"].max()),
+                "duration_s": round(float(records["end_ns"].max() - records["start_ns"].min()) / 1e9, 3),
+                "stages": [stage for stage in store.categories.get("stage", []) if stage]}
+
+    def list_runs(self):
+        """Runs in start order, each the merge of its index lines; no run data is read."""
+        runs = {}
+        if os.path.exists(self._index_path()):
+            with open(self._index_path()) as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        runs.setdefault(entry["id"], {}).update(entry)
+        return list(runs.values())
+
+    def get(self, run_id):
+        with open(os.path.join(self.run_dir(run_id), META_FILE)) as file:
+            return json.load(file)
+
+    def results_file(self, run_id):
+        # Path the run's data is addressed by, as for load_results; the CSV itself may not exist
+        return os.path.join(self.run_dir(run_id), RESULTS_CSV)
+
+    def load(self, run_id, rollup=None):
+        return load_results(self.results_file(run_id), rollup)
+
+    def compare(self, run_ids, rollup=None):
+        """Per-vuser summaries of the runs in one long frame (Run, VusersNumber, ...), for overlays."""
+        frames = []
+        for run_id in run_ids:
+            summary = vuser_summary(self.load(run_id, rollup))
+            summary.insert(0, "Run", run_id)
+            frames.append(summary)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def diff(self, base_id, run_id, rollup=None):
+        """Summaries of two runs side by side at the vuser counts both reached, with the differences."""
+        base = vuser_summary(self.load(base_id, rollup))
+        other = vuser_summary(self.load(run_id, rollup))
+        merged = base.merge(other, on="VusersNumber", suffixes=(" base", " run"))
+        for column in ("Mean[ms]", "P50[ms]", "P95[ms]", "P99[ms]", "ErrorRate"):
+            merged[f"{column} diff"] = merged[f"{column} run"] - merged[f"{column} base"]
+        return merged
@@ -1,63 +1,476 @@
-import csv
-import datetime
+import asyncio
+import atexit
+import multiprocessing
+import os
+import queue
+import random
 import threading
 import time
 
+from src.utils.AdaptiveSearch import AdaptiveSearch
+from src.utils.ArrivalRate import ArrivalRate
+from src.utils.Context import SharedContext
+from src.utils.Feeder import Feeder
+from src.utils.Histogram import SampledSink, StatsAggregator
+from src.utils.LoadProfile import load_profile, parse_profile, run_profile, users_at
+from src.utils.MetricsServer import MetricsServer
+from src.utils.Pacing import ThinkTime, get_timer_wheel
 from src.utils.Paths import get_results_csv_file
+from src.utils.Replay import MAX_LABELS, read_replay
+from src.utils.Request import Request, RequestFailed
+from src.utils.ResultStore import ResultStore, get_store_dir
+from src.utils.ResultWriter import CsvResultSink, QueueResultSink, ResultWriter
+from src.utils.Rollup import RollupSink
+from src.utils.Timing import Timing, aiohttp_trace_config, create_timed_session
 
 
 class Scenario:
     results_file = get_results_csv_file()
+    csv_export = True  # The columnar store is always written, results.csv only when enabled
+    raw_rows = 1  # Raw rows kept: every row (1), one in N (N) or none (0); statistics always see all rows
+    stats = None  # StatsAggregator fed by the writer, source of live percentiles and stage summaries
     requests = []
     threads = []
     lock = threading.Lock()
+    writer = None  # Background ResultWriter, started on the first logged result
+    stage_listeners = []  # Called with the stage id after each stage has been written out
+    engines = ("threads", "async")
+    connections = ("new", "reuse")
+    error_policies = ("continue", "restart", "stop")
 
-    def __init__(self, interval=0, max_timeout=0):
+    def __init__(self, interval=0, max_timeout=0, engine="threads", connection="new", pool_size=1,
+                 keep_alive=None, processes=1, flow=False, pacing=None, on_error="continue",
+                 think_time=None, start_offset=0, feeders=None):
+        if engine not in Scenario.engines:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {Scenario.engines}")
+        if connection not in Scenario.connections:
+            raise ValueError(f"Unknown connection mode '{connection}', expected one of {Scenario.connections}")
+        if on_error not in Scenario.error_policies:
+            raise ValueError(f"Unknown error policy '{on_error}', expected one of {Scenario.error_policies}")
         self.interval = interval
         self.max_timeout = max_timeout
+        self.engine = engine
+        self.connection = connection  # "new" behaves like a browser, "reuse" like an API client
+        self.pool_size = pool_size  # Connections kept open per virtual user when reusing
+        self.keep_alive = keep_alive  # Idle seconds after which a kept-alive connection is dropped
+        self.processes = processes or os.cpu_count()  # Worker processes the vusers are sharded across
+        self.stage = None  # Id of the running stage, recorded with every result row
+        self.summary = []  # Per-URL statistics of the last stage speed() ran
+        self.shard = (0, 1)  # (index, count) of this generator when a coordinator splits the load
+        self.flow = flow  # Each vuser walks the whole request chain in order instead of repeating one request
+        self.pacing = pacing  # Intended seconds between iteration starts of a vuser, None to start when ready
+        # After a failed request a vuser carries on ("continue"), starts over with a new session and
+        # context ("restart") or stops ("stop"); the failure is recorded either way
+        self.on_error = on_error
+        self.think_time = think_time  # ThinkTime spec replacing the fixed interval, e.g. "exponential:2"
+        self.think = ThinkTime(think_time) if think_time is not None else None
+        self.start_offset = start_offset  # Each vuser starts after a random 0..start_offset seconds
+        # Data files whose rows are fed into the vuser context at the start of every iteration
+        self.feeders = [feeder if isinstance(feeder, Feeder) else Feeder.from_dict(feeder) for feeder in feeders or ()]
+
+    def settings(self):
+        # Constructor arguments, used to recreate the scenario in another process or on an agent
+        return {"interval": self.interval, "max_timeout": self.max_timeout, "engine": self.engine,
+                "connection": self.connection, "pool_size": self.pool_size, "keep_alive": self.keep_alive,
+                "processes": self.processes, "flow": self.flow, "pacing": self.pacing, "on_error": self.on_error,
+                "think_time": self.think_time, "start_offset": self.start_offset,
+                "feeders": [feeder.to_dict() for feeder in self.feeders]}
+
+    def local_users(self, users):
+        # This generator's part of `users` when the load is split across agents
+        index, count = self.shard
+        return users // count + (1 if index < users % count else 0)
 
     def set_interval(self, interval):
         self.interval = interval
         return self
 
-    def speed(self, users, duration):
-        for request in Scenario.requests:
+    def set_engine(self, engine):
+        if engine not in Scenario.engines:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {Scenario.engines}")
+        self.engine = engine
+        return self
+
+    def set_connection(self, connection, pool_size=None, keep_alive=None):
+        if connection not in Scenario.connections:
+            raise ValueError(f"Unknown connection mode '{connection}', expected one of {Scenario.connections}")
+        self.connection = connection
+        if pool_size is not None:
+            self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        return self
+
+    def set_processes(self, processes=None):
+        # None shards the vusers across one worker process per CPU core
+        self.processes = processes or os.cpu_count()
+        return self
+
+    def set_flow(self, flow=True):
+        self.flow = flow
+        return self
+
+    def set_pacing(self, pacing):
+        self.pacing = pacing
+        return self
+
+    def set_think_time(self, think_time):
+        # None goes back to the fixed interval
+        self.think_time = think_time
+        self.think = ThinkTime(think_time) if think_time is not None else None
+        return self
+
+    def set_start_offset(self, start_offset):
+        self.start_offset = start_offset
+        return self
+
+    def add_feeder(self, path, mode="sequential", name=None):
+        self.feeders.append(Feeder(path, mode, name))
+        return self
+
+    def set_on_error(self, on_error):
+        if on_error not in Scenario.error_policies:
+            raise ValueError(f"Unknown error policy '{on_error}', expected one of {Scenario.error_policies}")
+        self.on_error = on_error
+        return self
+
+    def execute(self, request, session=None, context=None):
+        # One sample that never raises: a failed request comes back as a timing with its status and error class
+        try:
+            return request.print_response(timeout=self.max_timeout, session=session, context=context).timing
+        except RequestFailed as e:
+            return e.timing
+        except Exception as e:
+            print(f"Request {request.name} failed: {e!r}")  # Not an HTTP failure, e.g. a missing template variable
+            timing = Timing()
+            timing.mark_failed(e)
+            return timing
+
+    async def execute_async(self, session, request, context=None):
+        try:
+            return await request.print_response_async(session, timeout=self.max_timeout, context=context)
+        except RequestFailed as e:
+            return e.timing
+        except Exception as e:
+            print(f"Request {request.name} failed: {e!r}")
+            timing = Timing()
+            timing.mark_failed(e)
+            return timing
+
+    def drop_idle_connections(self, session, last_used):
+        # Connections idle longer than keep_alive are closed; the session opens new ones on its next request
+        if session is not None and self.keep_alive is not None and time.perf_counter() - last_used > self.keep_alive:
+            session.close()
+            return True
+        return False
+
+    def restart_vuser(self, session):
+        # "restart" error policy: the vuser starts over as a new user
+        if session is not None:
+            session.close()
+        return self.create_session(), self.new_context()
+
+    def think_seconds(self):
+        # Pause after a request: drawn from the think time distribution, else the fixed interval
+        return self.think.sample() if self.think is not None else self.interval
+
+    def start_delay(self):
+        # Random offset that spreads the first requests of the vusers instead of firing them in lockstep
+        return random.uniform(0, self.start_offset) if self.start_offset else 0
+
+    def iteration_delay(self, started, iteration):
+        # Iteration k of a vuser is intended to start `k * pacing` seconds after `started`. Waits for an
+        # early iteration; a late one starts at once and its lateness (ns) is added to its corrected latencies
+        if not self.pacing:
+            return 0
+        intended = started + iteration * self.pacing
+        if time.perf_counter() < intended:
+            get_timer_wheel().wait_until(intended)
+            return 0
+        return int((time.perf_counter() - intended) * 1e9)
+
+    def feed(self, context):
+        # Next row of every feeder into the vuser context; False once a "unique" feeder has run out
+        shard_index, shard_count = self.shard
+        for feeder in self.feeders:
+            row = feeder.next(shard_index, shard_count)
+            if row is None:
+                return False
+            if feeder.name:
+                context[feeder.name] = row
+            else:
+                context.update(row)
+        return True
+
+    def vuser_chains(self, requests):
+        # Requests each virtual user repeats: the whole chain in flow mode, otherwise a single request
+        return [list(requests)] if self.flow else [[request] for request in requests]
+
+    def new_context(self):
+        # Variables of one virtual user, filled by the extractors of the responses it receives. Outside flow
+        # mode saved values are shared by all vusers, as they were before contexts were per vuser
+        if not self.flow:
+            return SharedContext(Request.shared_variables)
+        return dict(Request.shared_variables)
+
+    def create_session(self):
+        # One pooled session per virtual user; None means a fresh connection for every request
+        if self.connection != "reuse":
+            return None
+        return create_timed_session(self.pool_size)
+
+    def speed(self, users, duration, stage=None):
+        self.stage = stage or f"speed-{users}"
+        self._speed(users, duration)
+        self.summary = Scenario.end_stage(self.stage)  # The stage is complete on disk once speed() returns
+        return self
+
+    def _speed(self, users, duration):
+        local_users = self.local_users(users)
+        if self.processes > 1:
+            self._speed_processes(local_users, duration, users)
+        else:
+            self._speed_local(local_users, duration, users)
+
+    def profile(self, profile, ramp_step=10):
+        # `profile` is a JSON/YAML file path or an already loaded list of stages
+        stages = load_profile(profile) if isinstance(profile, str) else parse_profile(profile)
+        if self.engine == "threads" and self.processes == 1:
+            run_profile(self, stages, Scenario.requests)
+            return self
+
+        # Other engines start their vusers per speed() call, so ramps become steps of `ramp_step` seconds
+        for stage in stages:
+            elapsed = 0
+            while elapsed < stage["duration"]:
+                step = min(ramp_step if stage["type"] == "ramp" else stage["duration"], stage["duration"] - elapsed)
+                self.stage = stage["id"]
+                self._speed(users_at(stage, elapsed), step)
+                elapsed += step
+            Scenario.end_stage(stage["id"])
+        return self
+
+    def rate(self, rps, duration, max_in_flight=100, arrivals="constant"):
+        # Open model: `rps` requests per second regardless of how fast the server answers
+        return self.rate_steps([(rps, duration)], max_in_flight=max_in_flight, arrivals=arrivals)
+
+    def rate_steps(self, steps, max_in_flight=100, arrivals="constant"):
+        # Each step is its own stage, named after its rate
+        executor = ArrivalRate(self, max_in_flight=max_in_flight, arrivals=arrivals)
+        stats = executor.run(steps, Scenario.requests)  # Ends each step's stage as the next one starts
+        print(f"Arrival rate {steps}: {stats}")
+        return self
+
+    def replay(self, path, speed=1.0, max_in_flight=100, stage="replay", response_policy="discard", label=None,
+               max_labels=MAX_LABELS):
+        # Open model driven by a recorded JSONL/HAR log: each entry is sent at its original offset / speed.
+        # `label` (function or path patterns) and `max_labels` bound the endpoints results are grouped by
+        executor = ArrivalRate(self, max_in_flight=max_in_flight)
+        stats = executor.replay(read_replay(path, response_policy, label, max_labels), speed, stage)
+        print(f"Replay of {path} at {speed}x: {stats}")
+        Scenario.end_stage(stage)
+        return self
+
+    def search(self, target_ms, percentile=95, **options):
+        # Closed loop: finds the highest vuser count whose live p`percentile` stays within `target_ms`
+        return AdaptiveSearch(self, target_ms, percentile, **options).run(Scenario.requests)
+
+    def _speed_local(self, users, duration, vusers):
+        # Runs `users` virtual users in this process; rows are labelled with the total `vusers`
+        if self.engine == "async":
+            asyncio.run(self._speed_async(users, duration, vusers))
+            return
+
+        Scenario.threads = []  # Only this stage's threads are joined below
+        for chain in self.vuser_chains(Scenario.requests):
             for _ in range(users):
-                thread = threading.Thread(target=self.run_scenario, args=(request, users, duration))
+                thread = threading.Thread(target=self.run_scenario, args=(chain, vusers, duration))
                 Scenario.threads.append(thread)
                 thread.start()
 
         for thread in Scenario.threads:
             thread.join()
-        return self
 
-    def run_scenario(self, request, vusers, duration):
+    def _speed_processes(self, users, duration, vusers):
+        processes = max(1, min(self.processes, users))
+        shares = [users // processes + (1 if i < users % processes else 0) for i in range(processes)]
+        result_queue = multiprocessing.Queue()
+        # Every worker waits here once it is ready, so all shards start their duration at the same instant
+        barrier = multiprocessing.Barrier(processes)
+        for feeder in self.feeders:
+            feeder.share_position()  # Rows consumed by the workers of this stage stay consumed in the next
+        workers = [multiprocessing.Process(target=_run_worker,
+                                           args=(self, Scenario.requests, share, vusers, duration, result_queue,
+                                                 barrier))
+                   for share in shares]
+        for worker in workers:
+            worker.start()
+
+        writer = Scenario.get_writer()
+        while any(worker.is_alive() for worker in workers) or not result_queue.empty():
+            try:
+                writer.put_many(result_queue.get(timeout=0.5))  # Workers send whole batches
+            except queue.Empty:
+                pass
+
+        for worker in workers:
+            worker.join()
+
+    def run_scenario(self, chain, vusers, duration):
+        session = self.create_session()
+        context = self.new_context()
         start_time = time.time()
-        while time.time() - start_time < duration:
-            response = request.print_response(timeout=self.max_timeout)
-            Scenario.log_result(vusers, request.url, response)
-            time.sleep(self.interval)  # Use the interval between requests
+        wheel = get_timer_wheel()
+        wheel.sleep(self.start_delay())  # The offset counts towards the duration, like a later arrival
+        last_used = time.perf_counter()
+        scheduled_from, iteration = time.perf_counter(), 0
+        try:
+            while time.time() - start_time < duration:
+                if not self.feed(context):
+                    return  # Out of unique data rows
+                delay_ns = self.iteration_delay(scheduled_from, iteration)
+                iteration += 1
+                for request in chain:
+                    self.drop_idle_connections(session, last_used)
+                    timing = self.execute(request, session, context)
+                    last_used = time.perf_counter()
+                    timing.delay_ns = delay_ns
+                    Scenario.log_timing(vusers, request.url, timing, self.stage)
+                    wheel.sleep(self.think_seconds())
+                    if timing.error and self.on_error != "continue":
+                        if self.on_error == "stop":
+                            return
+                        session, context = self.restart_vuser(session)
+                        break
+        finally:
+            if session is not None:
+                session.close()
+
+    async def _speed_async(self, users, duration, vusers):
+        # All vusers share one event loop and one non-blocking HTTP client
+        import aiohttp
+
+        # One connector is shared by all vusers, each with at most one request in flight, so pool_size
+        # (connections per vuser) does not apply here; keepalive_timeout is only valid for reused connections
+        options = {"force_close": True} if self.connection != "reuse" else (
+            {"keepalive_timeout": self.keep_alive} if self.keep_alive is not None else {})
+        connector = aiohttp.TCPConnector(limit=0, **options)  # Concurrency is bounded by the vuser count only
+        async with aiohttp.ClientSession(connector=connector, trace_configs=[aiohttp_trace_config()]) as session:
+            tasks = [asyncio.create_task(self.run_scenario_async(session, chain, vusers, duration))
+                     for chain in self.vuser_chains(Scenario.requests)
+                     for _ in range(users)]
+            # A failing vuser stops on its own, like a thread would, without cancelling the others
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"Virtual user stopped: {result!r}")
+
+    async def run_scenario_async(self, session, chain, vusers, duration):
+        loop = asyncio.get_running_loop()
+        context = self.new_context()
+        start_time = loop.time()
+        await asyncio.sleep(self.start_delay())
+        scheduled_from, iteration = loop.time(), 0
+        while loop.time() - start_time < duration:
+            if not self.feed(context):
+                return
+            delay_ns = 0
+            # Same schedule as iteration_delay; the event loop's own timer heap is already shared by all vusers
+            if self.pacing:
+                late = loop.time() - (scheduled_from + iteration * self.pacing)
+                if late < 0:
+                    await asyncio.sleep(-late)
+                delay_ns = max(0, int(late * 1e9))
+            iteration += 1
+            for request in chain:
+                timing = await self.execute_async(session, request, context)
+                timing.delay_ns = delay_ns
+                # Blocking on a full queue would stall every coroutine and show up in all their latencies
+                Scenario.log_timing(vusers, request.url, timing, self.stage, block=False)
+                await asyncio.sleep(self.think_seconds())
+                if timing.error and self.on_error != "continue":
+                    if self.on_error == "stop":
+                        return
+                    context = self.new_context()  # The connection pool is shared, only the context restarts
+                    break
 
     @staticmethod
-    def log_result(vusers, url, response):
-        end_time = datetime.datetime.now()
+    def log_result(vusers, url, response, stage=None):
+        Scenario.log_timing(vusers, url, response.timing, stage)
+
+    @staticmethod
+    def log_timing(vusers, url, timing, stage=None, block=True):
+        # Only builds the row; formatting and file I/O happen on the writer thread
         try:
-            start_time = end_time - response.elapsed
-            response_time = round(response.elapsed.total_seconds() * 1000, 3)  # Round the response time
-            with Scenario.lock:  # Lock the block of code to ensure thread safety
-                with open(Scenario.results_file, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(
-                        [vusers, url, start_time.strftime('%H:%M:%S:%f')[:-3],
-                         end_time.strftime('%H:%M:%S:%f')[:-3],
-                         response_time])  # Use the rounded response time
+            row = timing.as_row()
+            row.update(vusers=vusers, url=url, stage=stage or "")
+            Scenario.get_writer().put(row, block)
         except Exception as e:
             print(f"Error logging result: {e}")
 
+    @staticmethod
+    def get_writer():
+        if Scenario.writer is None:
+            with Scenario.lock:
+                if Scenario.writer is None:
+                    raw_sinks = [ResultStore(get_store_dir(Scenario.results_file))]
+                    if Scenario.csv_export:
+                        raw_sinks.append(CsvResultSink(Scenario.results_file))
+                    if Scenario.raw_rows > 1:
+                        raw_sinks = [SampledSink(sink, Scenario.raw_rows) for sink in raw_sinks]
+                    elif Scenario.raw_rows == 0:
+                        raw_sinks = []
+                    Scenario.stats = StatsAggregator(Scenario.get_stage_stats_file())
+                    # Rollups see every row, also when raw rows are sampled or not kept
+                    rollups = RollupSink(get_store_dir(Scenario.results_file))
+                    Scenario.start_writer([Scenario.stats, rollups] + raw_sinks)
+        return Scenario.writer
+
+    @staticmethod
+    def serve_metrics(port=9108, host="0.0.0.0"):
+        # Live Prometheus endpoint over the aggregator and writer of whatever run is in progress
+        return MetricsServer(lambda: (Scenario.stats, Scenario.writer), port=port, host=host).start()
+
+    @staticmethod
+    def get_stage_stats_file():
+        return os.path.join(os.path.dirname(os.path.abspath(Scenario.results_file)), "stage_stats.csv")
+
+    @staticmethod
+    def end_stage(stage):
+        # Writes out everything queued so far, then the aggregated statistics of the stage
+        Scenario.get_writer().flush()
+        summary = Scenario.stats.end_stage(stage) if Scenario.stats is not None else []
+        for listener in Scenario.stage_listeners:
+            listener(stage)
+        return summary
+
+    @staticmethod
+    def start_writer(sinks):
+        Scenario.writer = ResultWriter(sinks).start()
+        atexit.register(Scenario.close_writer)
+        return Scenario.writer
+
+    @staticmethod
+    def close_writer():
+        # Flushes every queued row and closes the result files
+        if Scenario.writer is not None:
+            Scenario.writer.close()
+            Scenario.writer = None
+
     # Execute all scenarios sequentially, once each
     @staticmethod
     def once():
+        scenario = Scenario()
         for request in Scenario.requests:
-            response = request.print_response()
+            timing = scenario.execute(request)
             # Logging with a vuser number of 1 as it's a single execution
-            Scenario.log_result(1, request.url, response)
\ No newline at end of file
+            Scenario.log_timing(1, request.url, timing, "once")
+        Scenario.end_stage("once")
+
+
+def _run_worker(scenario, scenario_requests, users, vusers, duration, result_queue, barrier):
+    # Entry point of a worker process started by Scenario.speed with processes > 1
+    Scenario.requests = scenario_requests
+    Scenario.threads = []
+    Scenario.start_writer([QueueResultSink(result_queue)])
+    barrier.wait()
+    scenario._speed_local(users, duration, vusers)
+    Scenario.close_writer()
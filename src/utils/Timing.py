@@ -0,0 +1,189 @@
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util import connection
+
+_local = threading.local()
+
+
+class Timing:
+    """Timing breakdown of one request, taken with perf_counter_ns.
+
+    Phases: DNS lookup, TCP connect, TLS handshake (all zero on a reused connection), time to first
+    byte (request sent until response headers) and body download. `start_ns`/`end_ns` are absolute
+    epoch nanoseconds, so they stay ordered across midnight. `delay_ns` is how late the request was
+    sent against its intended start; latency from the intended start corrects coordinated omission.
+    A failed request keeps its HTTP status (0 without a response) and the class name of its error.
+    """
+
+    __slots__ = ("start_ns", "started", "dns_ns", "connect_ns", "tls_ns", "ttfb_ns", "download_ns",
+                 "total_ns", "headers_at", "bytes", "checksum", "delay_ns", "status", "error")
+
+    def __init__(self):
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter_ns()
+        self.dns_ns = 0
+        self.connect_ns = 0
+        self.tls_ns = 0
+        self.ttfb_ns = 0
+        self.download_ns = 0
+        self.total_ns = 0
+        self.headers_at = 0
+        self.bytes = 0
+        self.checksum = None  # CRC32 of the body, kept by the "checksum" response policy
+        self.delay_ns = 0
+        self.status = 0
+        self.error = ""
+
+    def mark_headers(self):
+        self.headers_at = time.perf_counter_ns()
+        self.ttfb_ns = self.headers_at - self.started - self.dns_ns - self.connect_ns - self.tls_ns
+
+    def mark_done(self, size=0):
+        now = time.perf_counter_ns()
+        self.download_ns = now - self.headers_at
+        self.total_ns = now - self.started
+        self.bytes = size
+
+    def mark_failed(self, error, name=None):
+        # Keeps the phases measured so far; a request that fails before its body ends at the failure
+        if not self.total_ns:
+            self.total_ns = time.perf_counter_ns() - self.started
+        self.error = name or type(error).__name__
+
+    @property
+    def end_ns(self):
+        return self.start_ns + self.total_ns
+
+    def as_row(self):
+        return {
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "response_ms": round(self.total_ns / 1e6, 3),
+            "dns_ms": round(self.dns_ns / 1e6, 3),
+            "connect_ms": round(self.connect_ns / 1e6, 3),
+            "tls_ms": round(self.tls_ns / 1e6, 3),
+            "ttfb_ms": round(self.ttfb_ns / 1e6, 3),
+            "download_ms": round(self.download_ns / 1e6, 3),
+            "corrected_ms": round((self.total_ns + self.delay_ns) / 1e6, 3),
+            "status": self.status,
+            "bytes": self.bytes,
+            "error": self.error,
+        }
+
+
+def start_timing():
+    # The connection classes below add their phases to the timing of the calling thread
+    _local.timing = Timing()
+    return _local.timing
+
+
+def current_timing():
+    return getattr(_local, "timing", None)
+
+
+class TimedConnectionMixin:
+    def _new_conn(self):
+        # Same as urllib3's _new_conn, with name resolution split out so DNS and TCP connect are timed apart
+        timing = current_timing()
+        started = time.perf_counter_ns()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, connection.allowed_gai_family(),
+                                           socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter_ns()
+
+        # Every resolved address is tried in turn, as urllib3's create_connection does, so a dual-stack
+        # host whose first address is unreachable is still reached; the last failure is reported
+        error = None
+        for address in dict.fromkeys(info[4][0] for info in addresses):
+            try:
+                sock = connection.create_connection((address, self.port), self.timeout,
+                                                    source_address=self.source_address,
+                                                    socket_options=self.socket_options)
+                break
+            except OSError as e:  # socket.timeout included
+                error = e
+        else:
+            if isinstance(error, socket.timeout):
+                raise ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from error
+            raise NewConnectionError(self, f"Failed to establish a new connection: {error}") from error
+
+        if timing is not None:
+            timing.dns_ns += resolved - started
+            timing.connect_ns += time.perf_counter_ns() - resolved
+        return sock
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        # Whatever connect() spends beyond DNS and TCP connect is the TLS handshake
+        timing = current_timing()
+        before = timing.dns_ns + timing.connect_ns if timing is not None else 0
+        started = time.perf_counter_ns()
+        super().connect()
+        if timing is not None:
+            timing.tls_ns += time.perf_counter_ns() - started - (timing.dns_ns + timing.connect_ns - before)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                   "https": TimedHTTPSConnectionPool}
+
+
+def create_timed_session(pool_size=1):
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def aiohttp_trace_config():
+    # aiohttp reports DNS and connection creation; its connection phase includes the TLS handshake
+    import aiohttp
+
+    async def on_dns_start(session, context, params):
+        context.dns_started = time.perf_counter_ns()
+
+    async def on_dns_end(session, context, params):
+        context.trace_request_ctx.dns_ns += time.perf_counter_ns() - context.dns_started
+
+    async def on_connection_start(session, context, params):
+        context.connection_started = time.perf_counter_ns()
+        context.dns_before = context.trace_request_ctx.dns_ns
+
+    async def on_connection_end(session, context, params):
+        timing = context.trace_request_ctx
+        elapsed = time.perf_counter_ns() - context.connection_started
+        timing.connect_ns += elapsed - (timing.dns_ns - context.dns_before)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_end)
+    trace_config.on_connection_create_start.append(on_connection_start)
+    trace_config.on_connection_create_end.append(on_connection_end)
+    return trace_config
+
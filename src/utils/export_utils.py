@@ -1,25 +1,28 @@
 import os
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 def export_predictions_to_csv(predictor, vusers_data, actual_response_times, output_path="./src/results/predictions.csv"):
     """Export actual and predicted response times to CSV."""
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    predictions = []
-    for i in range(len(vusers_data) - predictor.sequence_length):
-        input_sequence = vusers_data[i:i+predictor.sequence_length]
-        predicted_time = predictor.predict_response_time(input_sequence)
-        actual_time = actual_response_times[i+predictor.sequence_length]
+    # Every window in one batched forward pass instead of one model.predict per window
+    sequence_length = predictor.sequence_length
+    vusers_data = np.asarray(vusers_data).reshape(-1, 1)
+    actual_times = np.asarray(actual_response_times).reshape(-1)[sequence_length:]
+    if len(vusers_data) > sequence_length:
+        windows = sliding_window_view(vusers_data[:, 0], sequence_length)[:len(vusers_data) - sequence_length]
+        predicted_times = predictor.predict_batch(windows)
+    else:
+        predicted_times = np.array([])
 
-        predictions.append({
-            "vusers": vusers_data[i+predictor.sequence_length][0],
-            "actual_response_time": actual_time[0],
-            "predicted_response_time": predicted_time,
-            "prediction_error": predicted_time - actual_time[0]
-        })
-
-    df = pd.DataFrame(predictions)
+    df = pd.DataFrame({
+        "vusers": vusers_data[sequence_length:, 0],
+        "actual_response_time": actual_times,
+        "predicted_response_time": predicted_times,
+        "prediction_error": predicted_times - actual_times
+    })
     df.to_csv(output_path, index=False)
     print(f"Predictions exported to {output_path}")
     return df
\ No newline at end of file
@@ -11,6 +11,8 @@ from plotly.subplots import make_subplots
 from dash import Dash, dcc, html, Input, Output, State, callback_context
 import dash_bootstrap_components as dbc
 from src.utils.Paths import get_results_csv_file
+from src.utils.ResultStore import ROLLUP_LEVELS, load_results, merge_rollups, results_available
+from src.utils.RunCatalog import RunCatalog
 from src.prediction_models.lstm.lstm_trainer import predict_response_time, calculate_optimal_vusers
 
 # Konfiguracja aplikacji Dash
@@ -21,6 +23,7 @@ server = app.server
 COLORS = {
     'actual': 'blue',
     'predicted': 'red',
+    'corrected': 'orange',
     'background': '#f8f9fa',
     'text': '#212529'
 }
@@ -36,7 +39,7 @@ def wait_for_files():
     max_retries = 30
 
     while not files_exist and retries < max_retries:
-        results_exists = os.path.exists(results_file) and os.path.getsize(results_file) > 0
+        results_exists = results_available(results_file)
         predictions_exists = os.path.exists(prediction_file) and os.path.getsize(prediction_file) > 0
 
         if results_exists:
@@ -51,8 +54,8 @@ def wait_for_files():
     return results_exists, os.path.exists(prediction_file) and os.path.getsize(prediction_file) > 0
 
 
-def load_data():
-    """Wczytuje dane z plików CSV."""
+def load_data(rollup=None):
+    """Wczytuje dane z plików CSV; `rollup` (1, 10 lub 60 s) wybiera agregaty przedziałów zamiast wyników."""
     results_file = get_results_csv_file()
     prediction_file = "./src/results/predictions.csv"
 
@@ -60,11 +63,9 @@ def load_data():
     predictions = None
 
     # Wczytaj wyniki testów
-    if os.path.exists(results_file):
+    if results_available(results_file):
         try:
-            data = pd.read_csv(results_file)
-            data['StartTime'] = pd.to_datetime(data['StartTime'], format='%H:%M:%S:%f')
-            data['EndTime'] = pd.to_datetime(data['EndTime'], format='%H:%M:%S:%f')
+            data = load_results(results_file, rollup)
             print(f"Wczytano {len(data)} rekordów z pliku wyników.")
         except Exception as e:
             print(f"Błąd podczas wczytywania pliku wyników: {e}")
@@ -216,6 +217,47 @@ def create_response_vs_users_graph(data, predictions=None):
     return fig
 
 
+def create_percentiles_graph(data):
+    """Tworzy wykres percentyli czasu odpowiedzi (zmierzonych i skorygowanych) dla liczby użytkowników."""
+    fig = go.Figure()
+    columns = [('ResponseTime[ms]', 'Zmierzony', COLORS['actual'])]
+    # Czas liczony od zamierzonego startu zapytania - korekta coordinated omission
+    if 'CorrectedResponseTime[ms]' in data.columns:
+        columns.append(('CorrectedResponseTime[ms]', 'Skorygowany', COLORS['corrected']))
+
+    # Agregaty przedziałów łączone są przez zsumowanie ich kubełków czasu odpowiedzi; agregaty starszych wersji
+    # nie mają kubełków, więc ich percentyle są tylko przybliżone (średnia ważona liczbą zapytań)
+    rollup = 'P99[ms]' in data.columns
+    merged = merge_rollups(data) if rollup else None
+    approximate = ' (przybliżony)' if rollup and 'Buckets' not in data.columns else ''
+    grouped = data.groupby('VusersNumber', observed=True)
+    for column, label, color in columns:
+        prefix = 'Corrected' if column.startswith('Corrected') else ''
+        for percentile, dash in ((0.5, 'dot'), (0.99, 'solid')):
+            if rollup:
+                values = merged[f'{prefix}P{int(percentile * 100)}[ms]']
+            else:
+                values = grouped[column].quantile(percentile)
+            fig.add_trace(go.Scatter(
+                x=values.index,
+                y=values.values,
+                mode='lines+markers',
+                name=f'{label} p{int(percentile * 100)}{approximate}',
+                line=dict(color=color, dash=dash)
+            ))
+
+    fig.update_layout(
+        title='Percentyle czasu odpowiedzi a liczba użytkowników',
+        xaxis_title='Liczba użytkowników',
+        yaxis_title='Czas odpowiedzi (ms)',
+        plot_bgcolor=COLORS['background'],
+        paper_bgcolor=COLORS['background'],
+        font=dict(color=COLORS['text'])
+    )
+
+    return fig
+
+
 def create_prediction_error_graph(predictions):
     """Tworzy wykres błędów predykcji LSTM."""
     if predictions is None or 'prediction_error' not in predictions.columns:
@@ -265,6 +307,56 @@ def create_prediction_error_graph(predictions):
     return fig
 
 
+def run_options():
+    """Opcje listy przebiegów z katalogu - najnowsze na górze."""
+    options = []
+    for run in reversed(RunCatalog().list_runs()):
+        summary = run.get('summary', {})
+        label = f"{run['id']} {run.get('label') or ''} ({run.get('status')}, {summary.get('requests', 0)} zapytań)"
+        options.append({"label": label, "value": run['id']})
+    return options
+
+
+def create_runs_compare_graph(run_ids, rollup=None):
+    """Tworzy wykres p50/p95 od liczby użytkowników dla wybranych przebiegów; dla dwóch także różnicę p95."""
+    catalog = RunCatalog()
+    two_runs = bool(run_ids) and len(run_ids) == 2
+    titles = ('Percentyle przebiegów', 'Różnica p95 (drugi - pierwszy)') if two_runs else None
+    fig = make_subplots(rows=2 if two_runs else 1, cols=1, shared_xaxes=True, subplot_titles=titles)
+    if run_ids:
+        compared = catalog.compare(run_ids, rollup or None)
+        for run_id, summary in compared.groupby('Run', sort=False):
+            for column, dash in (('P50[ms]', 'dot'), ('P95[ms]', 'solid')):
+                fig.add_trace(go.Scatter(
+                    x=summary['VusersNumber'],
+                    y=summary[column],
+                    mode='lines+markers',
+                    name=f'{run_id} {column[:3].lower()}',
+                    legendgroup=run_id,
+                    line=dict(dash=dash)
+                ), row=1, col=1)
+        if two_runs:
+            diff = catalog.diff(run_ids[0], run_ids[1], rollup or None)
+            fig.add_trace(go.Bar(
+                x=diff['VusersNumber'],
+                y=diff['P95[ms] diff'],
+                name='Różnica p95',
+                marker_color=['red' if value > 0 else 'green' for value in diff['P95[ms] diff']]
+            ), row=2, col=1)
+
+    fig.update_layout(
+        title='Porównanie przebiegów' if run_ids else 'Porównanie przebiegów (wybierz przebiegi)',
+        xaxis_title='Liczba użytkowników',
+        yaxis_title='Czas odpowiedzi (ms)',
+        height=700 if two_runs else 450,
+        plot_bgcolor=COLORS['background'],
+        paper_bgcolor=COLORS['background'],
+        font=dict(color=COLORS['text'])
+    )
+
+    return fig
+
+
 # Definicja układu aplikacji
 def serve_layout():
     """Generuje układ aplikacji Dash."""
@@ -296,6 +388,15 @@ def serve_layout():
                 dbc.Button("Automatyczne odświeżanie", id="auto-refresh", color="secondary", className="mb-2"),
                 html.Div(id="refresh-status", className="text-muted mb-3"),
                 dcc.Interval(id="interval-component", interval=15000, disabled=True),  # 15 sekund
+                dcc.Dropdown(
+                    id="rollup-level",
+                    options=[{"label": "Surowe wyniki", "value": 0}] + [
+                        {"label": f"Agregaty {level} s", "value": level} for level in ROLLUP_LEVELS],
+                    value=0,
+                    clearable=False,
+                    style={"maxWidth": "300px"},
+                    className="mb-2"
+                ),
                 html.Div(id="refresh-trigger")
             ], width=12)
         ], className="mb-4"),
@@ -334,6 +435,31 @@ def serve_layout():
             ], width=12, className="mb-4")
         ]),
 
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Percentyle czasu odpowiedzi"),
+                    dbc.CardBody([
+                        dcc.Graph(id="percentiles-graph", figure=create_percentiles_graph(data))
+                    ])
+                ])
+            ], width=12, className="mb-4")
+        ]),
+
+        # Porównanie przebiegów z katalogu (results/runs)
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Porównanie przebiegów"),
+                    dbc.CardBody([
+                        dcc.Dropdown(id="runs-select", options=run_options(), multi=True,
+                                     placeholder="Wybierz przebiegi do porównania", className="mb-2"),
+                        dcc.Graph(id="runs-compare-graph", figure=create_runs_compare_graph([]))
+                    ])
+                ])
+            ], width=12, className="mb-4")
+        ]),
+
         # Wykresy błędów predykcji tylko jeśli są dane predykcji
         dbc.Row([
             dbc.Col([
@@ -403,20 +529,35 @@ def handle_refresh(btn_click, auto_click, interval, is_disabled):
     [Output("active-users-graph", "figure"),
      Output("response-time-graph", "figure"),
      Output("response-vs-users-graph", "figure"),
+     Output("percentiles-graph", "figure"),
      Output("prediction-error-graph", "figure", allow_duplicate=True)],
-    [Input("refresh-trigger", "children")],
+    [Input("refresh-trigger", "children"),
+     Input("rollup-level", "value")],
     prevent_initial_call=True
 )
-def update_graphs(_):
-    data, predictions = load_data()
+def update_graphs(_, rollup):
+    data, predictions = load_data(rollup)
     return (
         create_active_users_graph(data),
         create_response_time_graph(data, predictions),
         create_response_vs_users_graph(data, predictions),
+        create_percentiles_graph(data),
         create_prediction_error_graph(predictions)
     )
 
 
+# Porównanie wybranych przebiegów; lista przebiegów odświeżana razem z danymi
+@app.callback(
+    [Output("runs-compare-graph", "figure"),
+     Output("runs-select", "options")],
+    [Input("runs-select", "value"),
+     Input("rollup-level", "value"),
+     Input("refresh-trigger", "children")]
+)
+def update_runs_compare(run_ids, rollup, _):
+    return create_runs_compare_graph(run_ids or [], rollup), run_options()
+
+
 # Uruchomienie serwera
 if __name__ == "__main__":
     # Utworzenie katalogu results jeśli nie istnieje
@@ -0,0 +1,73 @@
+"""Shared fixtures: a local HTTP server and Scenario state that writes into a temporary directory.
+
+Run from the repository root, so that `src` is importable: python -m pytest -q tests
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.Request import Request
+from src.utils.Scenario import Scenario
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Answers every path with a small JSON body naming it; paths starting with /fail get a 500
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.paths.append(self.path)
+        body = json.dumps({"path": self.path, "token": "abc"}).encode()
+        self.send_response(500 if self.path.startswith("/fail") else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.paths = []  # Request paths in arrival order
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def scenario_results(tmp_path, monkeypatch):
+    # Scenario keeps its requests, writer and statistics on the class; each test gets its own
+    monkeypatch.setattr(Scenario, "results_file", str(tmp_path / "results.csv"))
+    monkeypatch.setattr(Scenario, "requests", [])
+    monkeypatch.setattr(Scenario, "threads", [])
+    monkeypatch.setattr(Request, "shared_variables", {})
+    yield Scenario.results_file
+    Scenario.close_writer()
+    Scenario.stats = None
+
+
+def result_rows(count, vusers=1, url="http://localhost/item", stage="s", start_ns=None, response_ms=None,
+                error=""):
+    """Result rows as the writer receives them, one per millisecond from `start_ns`."""
+    start_ns = time.time_ns() if start_ns is None else start_ns
+    rows = []
+    for i in range(count):
+        latency = float(i % 100) if response_ms is None else response_ms
+        rows.append({"vusers": vusers, "url": url, "stage": stage, "start_ns": start_ns + i * 1_000_000,
+                     "end_ns": start_ns + i * 1_000_000 + int(latency * 1e6), "response_ms": latency,
+                     "dns_ms": 0.0, "connect_ms": 0.0, "tls_ms": 0.0, "ttfb_ms": latency, "download_ms": 0.0,
+                     "corrected_ms": latency, "status": 500 if error else 200, "bytes": 10, "error": error})
+    return rows
@@ -0,0 +1,64 @@
+import pytest
+
+from src.utils.Request import Request
+from src.utils.Scenario import Scenario
+
+
+def flow(server):
+    # Each iteration logs in, fails and would then check out; the login saves a token into the context
+    return [Request(name).set_url(server.url + path).set_method("GET").set_headers("").set_response_policy("discard")
+            for name, path in (("login", "/login"), ("fail", "/fail"), ("checkout", "/checkout"))]
+
+
+def run(server, monkeypatch, on_error, engine):
+    Scenario.requests.extend(flow(server))
+    Scenario.requests[0].save("token")
+    contexts = []
+    new_context = Scenario.new_context
+
+    def spy(self):
+        contexts.append(new_context(self))
+        return contexts[-1]
+
+    monkeypatch.setattr(Scenario, "new_context", spy)
+    scenario = Scenario(engine=engine, flow=True, on_error=on_error).speed(1, 0.5)
+    return scenario, contexts
+
+
+@pytest.mark.parametrize("engine", Scenario.engines)
+def test_restart_starts_the_vuser_over_with_a_new_context(http_server, scenario_results, monkeypatch, engine):
+    _, contexts = run(http_server, monkeypatch, "restart", engine)
+    paths = http_server.paths
+
+    assert "/checkout" not in paths
+    assert paths[:4] == ["/login", "/fail", "/login", "/fail"]
+    assert len(contexts) == paths.count("/fail") + 1  # The first one, then one per failure
+    assert all(context is not other for context, other in zip(contexts, contexts[1:]))
+    assert all(context["token"] == "abc" for context in contexts[:-1])  # Each filled by its own login
+
+
+@pytest.mark.parametrize("engine", Scenario.engines)
+def test_stop_ends_the_vuser_at_its_first_failure(http_server, scenario_results, monkeypatch, engine):
+    _, contexts = run(http_server, monkeypatch, "stop", engine)
+
+    assert http_server.paths == ["/login", "/fail"]
+    assert len(contexts) == 1
+
+
+@pytest.mark.parametrize("engine", Scenario.engines)
+def test_continue_carries_on_after_a_failure(http_server, scenario_results, monkeypatch, engine):
+    _, contexts = run(http_server, monkeypatch, "continue", engine)
+
+    assert http_server.paths[:3] == ["/login", "/fail", "/checkout"]
+    assert len(contexts) == 1
+
+
+@pytest.mark.parametrize("on_error", Scenario.error_policies)
+def test_failures_are_recorded_under_every_policy(http_server, scenario_results, monkeypatch, on_error):
+    scenario, _ = run(http_server, monkeypatch, on_error, "threads")
+    summary = {row["URL"]: row for row in scenario.summary}
+    failed = summary[http_server.url + "/fail"]
+
+    assert failed["Count"] == failed["Errors"] == http_server.paths.count("/fail")
+    assert "HTTPError" in failed["ErrorClasses"]
+    assert summary["ALL"]["Count"] == len(http_server.paths)
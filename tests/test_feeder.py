@@ -0,0 +1,71 @@
+import multiprocessing
+
+import pytest
+
+from src.utils.Feeder import Feeder
+from src.utils.Request import Request
+from src.utils.Scenario import Scenario
+
+fork = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                          reason="worker processes inherit the shared position by forking")
+
+
+def write_rows(path, count):
+    with open(path, "w") as file:
+        file.write("id,name\n")
+        file.writelines(f"{i},user{i}\n" for i in range(count))
+    return str(path)
+
+
+def drain(feeder, rows):
+    # Worker process: takes rows until the unique feeder runs out
+    while True:
+        row = feeder.next()
+        if row is None:
+            return
+        rows.put(int(row["id"]))
+
+
+@fork
+def test_unique_rows_are_shared_across_processes(tmp_path):
+    feeder = Feeder(write_rows(tmp_path / "users.csv", 200), mode="unique")
+    assert feeder.next()["id"] == "0"  # Taken by the parent before the workers start
+    feeder.share_position()
+    context = multiprocessing.get_context("fork")
+    rows = context.Queue()
+    workers = [context.Process(target=drain, args=(feeder, rows)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    taken = [rows.get(timeout=10) for _ in range(199)]
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert sorted(taken) == list(range(1, 200))
+    assert rows.empty()
+    assert feeder.next() is None  # The parent continues from where the workers stopped
+
+
+def test_rows_are_split_between_agents(tmp_path):
+    path = write_rows(tmp_path / "users.csv", 10)
+    first, second = Feeder(path, mode="unique"), Feeder(path, mode="unique")
+    taken = [[], []]
+    for index, feeder in enumerate((first, second)):
+        for row in iter(lambda: feeder.next(index, 2), None):
+            taken[index].append(int(row["id"]))
+
+    assert taken == [[0, 2, 4, 6, 8], [1, 3, 5, 7, 9]]
+
+
+def test_sequential_rows_wrap_around(tmp_path):
+    feeder = Feeder(write_rows(tmp_path / "users.csv", 3))
+
+    assert [feeder.next()["name"] for _ in range(5)] == ["user0", "user1", "user2", "user0", "user1"]
+
+
+def test_worker_processes_never_send_a_unique_row_twice(tmp_path, http_server, scenario_results):
+    Scenario.requests.append(Request("item").set_url(http_server.url + "/item/{id}").set_method("GET")
+                             .set_headers("").set_response_policy("discard"))
+    scenario = Scenario(processes=2, feeders=[Feeder(write_rows(tmp_path / "users.csv", 30), mode="unique")])
+    scenario.speed(4, 2)
+
+    assert len(http_server.paths) == len(set(http_server.paths)) == 30
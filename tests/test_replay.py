@@ -0,0 +1,78 @@
+import json
+
+from src.utils.Replay import OTHER_LABEL, Labeler, endpoint_label, read_har, read_replay
+
+
+def har_entry(i, body_size=10):
+    return {"startedDateTime": f"2024-05-01T12:00:{i:02d}.000Z", "comment": None,
+            "request": {"method": "POST", "url": f"http://shop.local/orders/{1000 + i}?page={i}",
+                        "headers": [{"name": "Accept", "value": "*/*"}, {"name": ":authority", "value": "x"}],
+                        "postData": {"text": json.dumps({"note": "{" + "x" * body_size + "}"})}},
+            "response": {"status": 200, "content": {"text": "y" * body_size}}}
+
+
+def write_har(path, entries):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"log": {"version": "1.2", "creator": {"name": "test"}, "entries": entries}}, file, indent=1)
+    return str(path)
+
+
+def test_har_entries_stream_across_small_chunks(tmp_path):
+    # Entries far larger than a chunk, and keys split between chunks, still decode one by one
+    entries = [har_entry(i, body_size=1000 if i % 3 else 10) for i in range(20)]
+    path = write_har(tmp_path / "log.har", entries)
+
+    assert list(read_har(path, chunk_size=64)) == entries
+
+
+def test_truncated_har_yields_its_complete_entries(tmp_path):
+    entries = [har_entry(i) for i in range(5)]
+    path = write_har(tmp_path / "log.har", entries)
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text[:text.index(json.dumps(entries[4]["startedDateTime"]))])  # Capture still being written
+
+    assert list(read_har(path, chunk_size=128)) == entries[:4]
+
+
+def test_har_without_entries_yields_nothing(tmp_path):
+    assert list(read_har(write_har(tmp_path / "empty.har", []))) == []
+
+
+def test_replayed_har_keeps_order_offsets_and_bodies(tmp_path):
+    path = write_har(tmp_path / "log.har", [har_entry(i) for i in range(3)])
+    replayed = list(read_replay(path))
+
+    assert [offset for offset, _, _ in replayed] == [0.0, 1.0, 2.0]
+    assert {label for _, _, label in replayed} == {"http://shop.local/orders/:id"}
+    _, request, _ = replayed[0]
+    assert request.render({}) == ("http://shop.local/orders/1000?page=0", {"Accept": "*/*"},
+                                  json.dumps({"note": "{xxxxxxxxxx}"}))
+
+
+def test_endpoint_label_normalises_ids():
+    assert endpoint_label("https://api.local/users/12345/orders?limit=5") == "https://api.local/users/:id/orders"
+    assert (endpoint_label("http://h/carts/0b6f3c1e-8d2a-4c1b-9a7e-5f0e2d9c8b71/items")
+            == "http://h/carts/:id/items")
+    assert (endpoint_label("http://h/orders/ABC123", [(r"/orders/[A-Z]{3}\d+", "/orders/:order")])
+            == "http://h/orders/:order")
+
+
+def test_labels_beyond_the_limit_fold_into_other():
+    labeler = Labeler(max_labels=2)
+    labels = [labeler(f"http://h/{path}/1") for path in ("a", "b", "c", "a", "d")]
+
+    assert labels == ["http://h/a/:id", "http://h/b/:id", OTHER_LABEL, "http://h/a/:id", OTHER_LABEL]
+    assert labeler.folded == 2
+    assert labeler("http://h/e", name="checkout") == OTHER_LABEL  # Names count towards the limit too
+
+
+def test_replay_labels_with_a_custom_function(tmp_path):
+    path = tmp_path / "log.jsonl"
+    with open(path, "w") as file:
+        for i in range(6):
+            file.write(json.dumps({"timestamp": 1714564800 + i, "url": f"http://h/p{i}", "name": None}) + "\n")
+    labels = [label for _, _, label in read_replay(str(path), label=lambda url: url[-1], max_labels=3)]
+
+    assert labels == ["0", "1", "2", OTHER_LABEL, OTHER_LABEL, OTHER_LABEL]
@@ -0,0 +1,93 @@
+import pandas as pd
+
+from conftest import result_rows
+from src.utils.ResultStore import ResultStore, get_store_dir, load_result_arrays, load_results
+from src.utils.ResultWriter import CSV_HEADER, CsvResultSink
+
+
+def spy_frames(monkeypatch):
+    # Lengths of the record slices ResultStore.to_dataframe is asked to convert
+    converted = []
+    to_dataframe = ResultStore.to_dataframe
+
+    def spy(self, records=None):
+        frame = to_dataframe(self, records)
+        converted.append(len(frame))
+        return frame
+
+    monkeypatch.setattr(ResultStore, "to_dataframe", spy)
+    return converted
+
+
+def test_store_reload_parses_only_appended_records(tmp_path, monkeypatch):
+    csv_file = str(tmp_path / "results.csv")
+    store = ResultStore(get_store_dir(csv_file))
+    store.write(result_rows(1000))
+    converted = spy_frames(monkeypatch)
+
+    assert len(load_results(csv_file)) == 1000
+    assert len(load_results(csv_file)) == 1000  # Unchanged store: nothing converted again
+    store.write(result_rows(10, vusers=2, url="http://localhost/new"))
+    grown = load_results(csv_file)
+
+    assert converted == [1000, 10]
+    assert len(grown) == 1010
+    assert list(grown["URL"].cat.categories) == ["http://localhost/item", "http://localhost/new"]
+    assert grown["URL"].iloc[-1] == "http://localhost/new"
+    pd.testing.assert_frame_equal(grown, ResultStore(get_store_dir(csv_file)).to_dataframe())
+
+
+def test_store_reset_reloads_from_scratch(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    store = ResultStore(get_store_dir(csv_file))
+    store.write(result_rows(100))
+    assert len(load_results(csv_file)) == 100
+
+    store.reset()  # A new run
+    ResultStore(get_store_dir(csv_file)).write(result_rows(5, vusers=3))
+    reloaded = load_results(csv_file)
+
+    assert len(reloaded) == 5
+    assert set(reloaded["VusersNumber"]) == {3}
+
+
+def test_loaded_frame_is_not_changed_by_callers(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    ResultStore(get_store_dir(csv_file)).write(result_rows(10))
+    frame = load_results(csv_file)
+    frame["Added"] = 1
+
+    assert "Added" not in load_results(csv_file).columns
+
+
+def test_csv_reload_waits_for_complete_lines(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    with open(csv_file, "w", newline="") as file:
+        file.write(",".join(CSV_HEADER) + "\n")
+    sink = CsvResultSink(csv_file)
+    sink.write(result_rows(20))
+    sink.close()
+    assert len(load_results(csv_file)) == 20
+
+    with open(csv_file, newline="") as file:
+        row = file.read().splitlines(keepends=True)[1]
+    with open(csv_file, "a", newline="") as file:
+        file.write(row[:30])  # A row still being written
+    assert len(load_results(csv_file)) == 20
+
+    with open(csv_file, "a", newline="") as file:
+        file.write(row[30:])
+    reloaded = load_results(csv_file)
+
+    assert len(reloaded) == 21
+    assert reloaded["ResponseTime[ms]"].iloc[-1] == reloaded["ResponseTime[ms]"].iloc[0]
+
+
+def test_result_arrays_match_the_frame(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    ResultStore(get_store_dir(csv_file)).write(result_rows(300, vusers=4))
+    arrays = load_result_arrays(csv_file, ("VusersNumber", "ResponseTime[ms]", "CorrectedResponseTime[ms]"))
+    frame = load_results(csv_file)
+
+    for column, values in arrays.items():
+        assert (values == frame[column].to_numpy()).all()
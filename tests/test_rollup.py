@@ -0,0 +1,78 @@
+import numpy as np
+
+from conftest import result_rows
+from src.utils.ResultStore import (ROLLUP_BUCKET_BOUNDS_MS, ROLLUP_LEVELS, get_store_dir, load_rollups,
+                                   merge_rollups)
+from src.utils.Rollup import RollupSink
+
+START_NS = 1_714_564_800 * 10 ** 9  # A whole minute, so every level's intervals line up
+
+
+def write_run(csv_file, seconds=120):
+    # 100 rows per second; every 30th second is slow, the kind of spike an average of percentiles hides
+    sink = RollupSink(get_store_dir(csv_file))
+    rows = []
+    for second in range(seconds):
+        latency = 500.0 if second % 30 == 0 else None
+        batch = result_rows(100, vusers=10 if second < seconds // 2 else 20, start_ns=START_NS + second * 10 ** 9,
+                            response_ms=latency)
+        for i, row in enumerate(batch):
+            row["end_ns"] = START_NS + second * 10 ** 9 + i * 1_000_000  # Completion within the second
+            row["corrected_ms"] = row["response_ms"] * 2
+            row["error"] = "HTTPError" if i == 0 else ""
+        rows.extend(batch)
+    sink.write(rows)
+    sink.close()
+    return rows
+
+
+def test_every_level_counts_every_row(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    rows = write_run(csv_file)
+
+    for level in ROLLUP_LEVELS:
+        rollups = load_rollups(csv_file, level)
+        assert rollups["Count"].sum() == len(rows)
+        assert rollups["Errors"].sum() == 120
+        assert len(rollups) == 120 // level
+
+
+def test_longer_levels_hold_the_merged_buckets_of_shorter_ones(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    write_run(csv_file)
+    seconds, minutes = load_rollups(csv_file, 1), load_rollups(csv_file, 60)
+
+    for start, minute in minutes.groupby("StartTime"):
+        inside = seconds[(seconds["StartTime"] >= start) & (seconds["StartTime"] < start + np.timedelta64(60, "s"))]
+        assert (np.sum(list(inside["Buckets"]), axis=0) == np.sum(list(minute["Buckets"]), axis=0)).all()
+        assert minute["Max[ms]"].max() == inside["Max[ms]"].max()
+
+
+def test_merged_percentiles_stay_within_a_bucket_of_the_exact_value(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    rows = write_run(csv_file)
+    width = ROLLUP_BUCKET_BOUNDS_MS[1] / ROLLUP_BUCKET_BOUNDS_MS[0]
+
+    for level in ROLLUP_LEVELS:
+        merged = merge_rollups(load_rollups(csv_file, level))
+        for vusers in (10, 20):
+            latencies = [row["response_ms"] for row in rows if row["vusers"] == vusers]
+            exact = np.percentile(latencies, 99, method="inverted_cdf")
+            assert merged.loc[vusers, "Count"] == len(latencies)
+            assert exact <= merged.loc[vusers, "P99[ms]"] <= exact * width
+            assert merged.loc[vusers, "CorrectedP99[ms]"] >= 2 * exact
+            assert np.isclose(merged.loc[vusers, "ResponseTime[ms]"], np.mean(latencies), rtol=0.01)
+
+
+def test_rows_arriving_after_their_interval_was_written_add_a_record(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    sink = RollupSink(get_store_dir(csv_file), levels=(1,), grace=1)
+    sink.write(result_rows(10, start_ns=START_NS))
+    sink.write(result_rows(10, start_ns=START_NS + 5 * 10 ** 9))  # Moves the watermark past the first second
+    sink.write(result_rows(3, start_ns=START_NS))  # Late
+    sink.close()
+    rollups = load_rollups(csv_file, 1)
+    first = rollups[rollups["StartTime"] == rollups["StartTime"].min()]
+
+    assert sorted(first["Count"]) == [3, 10]
+    assert merge_rollups(first, by="URL")["Count"].iloc[0] == 13